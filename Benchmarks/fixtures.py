@@ -0,0 +1,315 @@
+import json
+import logging
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from Src.waits import DOM_QUIET_SCRIPT, NETWORK_STATE_SCRIPT
+
+logger = logging.getLogger("Fixtures")
+
+ACTION_METHODS = ("click", "send_keys", "clear")
+
+
+def binance_key(payload):
+    return f"{payload['asset']}|{payload['fiat']}|{payload['tradeType']}|{payload['page']}"
+
+
+def api_key(path, params):
+    return f"{path}?{urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))}"
+
+
+def script_key(script, args):
+    plain = ["<element>" if hasattr(arg, "get_attribute") else arg for arg in args]
+    return f"execute_script|{script}|{json.dumps(plain, sort_keys=True, default=str)}"
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+class RecordingElement:
+    def __init__(self, driver, element):
+        self.driver = driver
+        self.element = element
+        self.record = driver.element_record(element)
+
+    @property
+    def text(self):
+        try:
+            value = self.element.text
+        except StaleElementReferenceException:
+            self.record.setdefault("stale", self.driver.generation)
+            raise
+        self.record["text"][str(self.driver.generation)] = value
+        return value
+
+    def get_attribute(self, name):
+        value = self.element.get_attribute(name)
+        self.record["attrs"][name] = value
+        return value
+
+    def is_displayed(self):
+        value = self.element.is_displayed()
+        self.record["displayed"] = value
+        return value
+
+    def is_enabled(self):
+        try:
+            return self.element.is_enabled()
+        except StaleElementReferenceException:
+            self.record.setdefault("stale", self.driver.generation)
+            raise
+
+    def __getattr__(self, name):
+        attr = getattr(self.element, name)
+        if name in ACTION_METHODS:
+            def action(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                self.driver.generation += 1
+                return result
+            return action
+        return attr
+
+
+class RecordingDriver:
+    def __init__(self, driver, path):
+        self.driver = driver
+        self.path = path
+        self.generation = 0
+        self.elements = {}
+        self.calls = {}
+
+    def element_record(self, element):
+        return self.elements.setdefault(element.id, {"text": {}, "attrs": {}, "displayed": True})
+
+    def store(self, key, value):
+        self.calls.setdefault(key, {})[str(self.generation)] = value
+
+    def wrap(self, result):
+        if isinstance(result, list):
+            return [self.wrap(item) for item in result]
+        if hasattr(result, "id") and hasattr(result, "get_attribute"):
+            return RecordingElement(self, result)
+        return result
+
+    def encode(self, result):
+        if isinstance(result, list):
+            return [self.encode(item) for item in result]
+        if isinstance(result, RecordingElement):
+            return {"__element__": result.element.id}
+        return result
+
+    def get(self, url):
+        self.driver.get(url)
+        self.generation += 1
+
+    def refresh(self):
+        self.driver.refresh()
+        self.generation += 1
+
+    def find_elements(self, by, value):
+        result = self.wrap(self.driver.find_elements(by, value))
+        self.store(f"find_elements|{by}|{value}", self.encode(result))
+        return result
+
+    def find_element(self, by, value):
+        try:
+            result = self.wrap(self.driver.find_element(by, value))
+        except NoSuchElementException:
+            self.store(f"find_element|{by}|{value}", None)
+            raise
+        self.store(f"find_element|{by}|{value}", self.encode(result))
+        return result
+
+    def execute_script(self, script, *args):
+        key = script_key(script, args)
+        args = [arg.element if isinstance(arg, RecordingElement) else arg for arg in args]
+        result = self.wrap(self.driver.execute_script(script, *args))
+        self.store(key, self.encode(result))
+        if "click()" in script:
+            self.generation += 1
+        return result
+
+    def quit(self):
+        save_json(self.path, {"elements": self.elements, "calls": self.calls})
+        logger.info(f"Recorded {len(self.calls)} driver calls to {self.path}")
+        self.driver.quit()
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+def at_generation(values, generation):
+    # Use the value recorded for this step, or the latest one before it.
+    best = None
+    for key, value in values.items():
+        if int(key) <= generation and (best is None or int(key) > best[0]):
+            best = (int(key), value)
+    return best[1] if best else None
+
+
+class FakeElement:
+    def __init__(self, driver, element_id):
+        self.driver = driver
+        self.id = element_id
+        self.record = driver.elements.get(element_id, {"text": {}, "attrs": {}, "displayed": True})
+
+    def check_stale(self):
+        stale = self.record.get("stale")
+        if stale is not None and self.driver.generation >= stale:
+            raise StaleElementReferenceException(f"Recorded element {self.id} went stale")
+
+    @property
+    def text(self):
+        self.check_stale()
+        return at_generation(self.record["text"], self.driver.generation) or ""
+
+    def get_attribute(self, name):
+        return self.record["attrs"].get(name)
+
+    def is_displayed(self):
+        return self.record.get("displayed", True)
+
+    def is_enabled(self):
+        self.check_stale()
+        return True
+
+    def click(self):
+        self.driver.generation += 1
+
+    def send_keys(self, *keys):
+        self.driver.generation += 1
+
+    def clear(self):
+        self.driver.generation += 1
+
+
+class FakeDriver:
+    def __init__(self, path):
+        fixture = load_json(path, {"elements": {}, "calls": {}})
+        self.elements = fixture["elements"]
+        self.calls = fixture["calls"]
+        self.generation = 0
+        self.page_source = ""
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if isinstance(value, dict) and "__element__" in value:
+            return FakeElement(self, value["__element__"])
+        return value
+
+    def lookup(self, key, default):
+        if key not in self.calls:
+            return default
+        return self.decode(at_generation(self.calls[key], self.generation))
+
+    def get(self, url):
+        self.generation += 1
+
+    def refresh(self):
+        self.generation += 1
+
+    def find_elements(self, by, value):
+        return self.lookup(f"find_elements|{by}|{value}", []) or []
+
+    def find_element(self, by, value):
+        result = self.lookup(f"find_element|{by}|{value}", None)
+        if result is None:
+            raise NoSuchElementException(f"No recorded element for {value}")
+        return result
+
+    def execute_script(self, script, *args):
+        # Replayed pages are static, so readiness probes report a settled page.
+        if script == NETWORK_STATE_SCRIPT:
+            return ["complete", 0]
+        if script == DOM_QUIET_SCRIPT:
+            return 60000
+        result = self.lookup(script_key(script, args), None)
+        if "click()" in script:
+            self.generation += 1
+        return result
+
+    def quit(self):
+        pass
+
+
+class FixtureHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class FixtureServer:
+    def __init__(self, fixture_dir, host="127.0.0.1", port=0):
+        self.binance = load_json(os.path.join(fixture_dir, "binance.json"), {})
+        self.fx = load_json(os.path.join(fixture_dir, "fx.json"), {"rates": {"USD": 1.0}})
+        # Binance spot tickers, for reference prices of assets other than USDT.
+        self.spot = load_json(os.path.join(fixture_dir, "spot.json"), [])
+        # Listing APIs are served under /<exchange>/..., one <exchange>_api.json each.
+        self.apis = {
+            name[:-len("_api.json")]: load_json(os.path.join(fixture_dir, name), {})
+            for name in os.listdir(fixture_dir) if name.endswith("_api.json")
+        } if os.path.isdir(fixture_dir) else {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.startswith("/fx"):
+                    self.reply(200, server.fx)
+                    return
+                if self.path.startswith("/spot"):
+                    self.reply(200, server.spot)
+                    return
+                url = urlsplit(self.path)
+                exchange, _, path = url.path.lstrip("/").partition("/")
+                responses = server.apis.get(exchange, {})
+                key = api_key("/" + path, dict(parse_qsl(url.query)))
+                if key in responses:
+                    self.reply(200, responses[key])
+                else:
+                    self.reply(404, {})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                self.reply(200, server.binance.get(binance_key(payload), {"data": []}))
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = FixtureHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fixture-server", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
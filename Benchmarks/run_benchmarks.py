@@ -0,0 +1,227 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from functools import wraps
+from Benchmarks.fixtures import FakeDriver, FixtureServer, RecordingDriver, api_key, binance_key, load_json, save_json
+from Src import browser_pool
+from Src import fiat_prices
+from Src.arbitrage import ArbitrageMatcher
+from Src.depth import DepthMatcher
+from Src import registry
+
+logger = logging.getLogger("Benchmarks")
+
+FIAT_CURRENCIES = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
+
+# Browser pool kind (None for HTTP) and the method that turns raw page data
+# into offers, so parse time can be split out of fetch time. Browser
+# scrapers parse with parse_api_offers when run with --backend api.
+SCRAPERS = {
+    "binance": (None, "parse_offers"),
+    "okx": ("chrome", "parse_rows"),
+    "remintano": ("chrome", "convert_prices"),
+    "paxful": ("uc", "extract_offers"),
+}
+
+
+def load_scraper(name, **kwargs):
+    return registry.scraper_class(name)(**kwargs)
+
+
+def timed_method(obj, method_name, timings, key):
+    method = getattr(obj, method_name)
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+
+    setattr(obj, method_name, wrapper)
+
+
+def use_drivers(kind, factory):
+    with browser_pool.pools_lock:
+        old = browser_pool.pools.pop(kind, None)
+    if old is not None:
+        old.close_all()
+    browser_pool.get_pool(kind, factory=factory, max_browsers=1)
+
+
+def record_binance(scraper, fixture_dir):
+    responses = load_json(os.path.join(fixture_dir, "binance.json"), {})
+    load = scraper.api.load
+
+    def recording_load(path, params=None, payload=None):
+        result = load(path, params, payload)
+        responses[binance_key(payload)] = result[0]
+        return result
+
+    scraper.api.load = recording_load
+    return responses
+
+
+def record_api(scraper, fixture_dir):
+    responses = load_json(os.path.join(fixture_dir, f"{scraper.name}_api.json"), {})
+    load = scraper.api.load
+
+    def recording_load(path, params=None, payload=None):
+        result = load(path, params, payload)
+        responses[api_key(path, params)] = result[0]
+        return result
+
+    scraper.api.load = recording_load
+    return responses
+
+
+def run_pipeline(fixture_dir, fiats, exchanges, record=False, backend="api"):
+    report = {"mode": "record" if record else "replay", "backend": backend, "fiats": fiats, "exchanges": {}, "stages": {}}
+    all_offers = []
+
+    with FixtureServer(fixture_dir) as server:
+        if record:
+            fx_table = fiat_prices.FXRateProvider().fetch_rates()
+            save_json(os.path.join(fixture_dir, "fx.json"), {"rates": fx_table})
+        else:
+            fiat_prices.default_provider = fiat_prices.FXRateProvider(url=f"{server.url}/fx")
+
+        for name in exchanges:
+            pool_kind, parse_method = SCRAPERS[name]
+            fixture_path = os.path.join(fixture_dir, f"{name}.json")
+            api_path = os.path.join(fixture_dir, f"{name}_api.json")
+            kwargs = {}
+            use_api = pool_kind is not None and backend == "api"
+            if pool_kind is None and not record:
+                kwargs["url"] = f"{server.url}/bapi/c2c/v2/friendly/c2c/adv/search"
+            if use_api:
+                parse_method = "parse_api_offers"
+                kwargs["mode"] = "api"
+                if not record:
+                    if not os.path.exists(api_path):
+                        logger.warning(f"No API fixture for {name} in {fixture_dir}, skipping.")
+                        continue
+                    kwargs["api_url"] = f"{server.url}/{name}"
+            elif pool_kind is not None:
+                kwargs["mode"] = "browser"
+                if record:
+                    live_factory = browser_pool.POOL_SETTINGS[pool_kind]["factory"]
+                    use_drivers(pool_kind, lambda headless=True: RecordingDriver(live_factory(headless=headless), fixture_path))
+                elif os.path.exists(fixture_path):
+                    use_drivers(pool_kind, lambda headless=True: FakeDriver(fixture_path))
+                else:
+                    logger.warning(f"No fixture for {name} in {fixture_dir}, skipping.")
+                    continue
+
+            scraper = load_scraper(name, **kwargs)
+            timings = {}
+            timed_method(scraper, parse_method, timings, "parse")
+            responses = None
+            if record and pool_kind is None:
+                responses = record_binance(scraper, fixture_dir)
+            elif record and use_api:
+                responses = record_api(scraper, fixture_dir)
+
+            start = time.perf_counter()
+            result = scraper.get_offers_many(fiats)
+            total = time.perf_counter() - start
+            if pool_kind is not None and not use_api:
+                browser_pool.get_pool(pool_kind).close_all()
+            if responses is not None:
+                save_json(api_path if use_api else os.path.join(fixture_dir, "binance.json"), responses)
+
+            start = time.perf_counter()
+            offers = []
+            for fiat, book in result.items():
+                rate = fiat_prices.get_exchange_rate(fiat)
+                if rate is None:
+                    continue
+                offers.extend(book.convert(rate))
+            fx_time = time.perf_counter() - start
+            all_offers.extend(offers)
+
+            parse_time = timings.get("parse", 0.0)
+            report["exchanges"][name] = {
+                "fetch": round(total - parse_time, 4),
+                "parse": round(parse_time, 4),
+                "fx": round(fx_time, 4),
+                "offers": len(offers),
+            }
+
+    start = time.perf_counter()
+    trades, best_trade = ArbitrageMatcher().match(all_offers)
+    report["stages"]["match"] = round(time.perf_counter() - start, 4)
+    start = time.perf_counter()
+    sized, _ = DepthMatcher().match(all_offers)
+    report["stages"]["depth"] = round(time.perf_counter() - start, 4)
+    for stage in ("fetch", "parse", "fx"):
+        report["stages"][stage] = round(sum(exchange[stage] for exchange in report["exchanges"].values()), 4)
+    report["stages"]["total"] = round(sum(report["stages"].values()), 4)
+    report["offers"] = len(all_offers)
+    report["trades"] = len(trades)
+    report["sized_trades"] = len(sized)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for stage, value in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before and value > before * (1 + tolerance) and value - before > 0.001:
+            regressions.append(f"{stage}: {before:.4f}s -> {value:.4f}s")
+    for name, stages in report["exchanges"].items():
+        for stage in ("fetch", "parse", "fx"):
+            before = baseline.get("exchanges", {}).get(name, {}).get(stage)
+            value = stages[stage]
+            if before and value > before * (1 + tolerance) and value - before > 0.001:
+                regressions.append(f"{name}.{stage}: {before:.4f}s -> {value:.4f}s")
+    return regressions
+
+
+def print_report(report):
+    print(f"\n========== Benchmark ({report['mode']}) ==========")
+    print(f"{'exchange':<12}{'fetch':>10}{'parse':>10}{'fx':>10}{'offers':>8}")
+    for name, stages in report["exchanges"].items():
+        print(f"{name:<12}{stages['fetch']:>10.4f}{stages['parse']:>10.4f}{stages['fx']:>10.4f}{stages['offers']:>8}")
+    print("-" * 50)
+    for stage, value in report["stages"].items():
+        print(f"{stage:<12}{value:>10.4f}s")
+    print(f"{report['offers']} offers, {report['trades']} trades above threshold")
+    print("===========================================\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the scrape -> FX -> match pipeline")
+    parser.add_argument("--record", action="store_true", help="hit the live sites and write fixtures")
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures", "sample"))
+    parser.add_argument("--fiats", nargs="+", default=FIAT_CURRENCIES)
+    parser.add_argument("--exchanges", nargs="+", default=list(SCRAPERS), choices=list(SCRAPERS))
+    parser.add_argument("--backend", choices=["api", "browser"], default="api", help="how OKX, Remitano and Paxful are fetched")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown per stage before failing")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    report = run_pipeline(args.fixtures, args.fiats, args.exchanges, record=args.record, backend=args.backend)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(report, load_json(args.baseline, {}), args.tolerance)
+        if regressions:
+            print("Performance regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,38 @@
-import requests
+import asyncio
+import hashlib
 import time
 import logging
 from Src.fiat_prices import get_exchange_rate
+from Src.offers import SIDES, Offer, OfferBook, ParseCache, to_amount, payment_methods
+from Src.scraper_base import Scraper, rate_limiter
+from Src import metrics
+from Src.api_client import ApiClient, ApiError
 
 BINANCE_P2P_URL = "https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search"
 
-class BinanceScraper:
+
+class BinanceScraper(Scraper):
     name = "binance"
-    supported_fiats =["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
-    
-    def fetch_data(self, asset="USDT", fiat="USD", trade_type="BUY", page=1, rows=10):
+    supported_fiats = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
+    supported_assets = ("USDT", "USDC", "BTC", "ETH")
+    max_concurrency = 8
+    supports_batch = True
+    rate_limit = 20
+    rate_burst = 16
+
+    def __init__(self, pages=1, rows=10, pool_size=32, max_retries=3, backoff=0.5, request_timeout=10, url=BINANCE_P2P_URL,
+                 cache=None):
+        self.url = url
+        self.pages = pages
+        self.rows = rows
+        # The search endpoint is the whole URL; pages are POSTed to it with
+        # the same retry, Retry-After and caching rules as the listing APIs.
+        self.api = ApiClient(self.name, url, pool_size=pool_size, max_retries=max_retries, backoff=backoff,
+                             request_timeout=request_timeout, cache=cache,
+                             limiter=rate_limiter(self.rate_limit, self.rate_burst))
+        self.parsed = ParseCache()
+
+    async def fetch_page(self, asset="USDT", fiat="USD", trade_type="BUY", page=1, rows=10):
         payload = {
             "page": page,
             "rows": rows,
@@ -18,55 +41,70 @@ class BinanceScraper:
             "fiat": fiat,
             "tradeType": trade_type
         }
-        headers = {"Content-Type": "application/json"}
+        # Rows per page is part of the page slot: a 10-row and a 20-row page
+        # 1 are different responses.
+        key = (self.name, asset, fiat, trade_type, (page, rows))
+        loop = asyncio.get_running_loop()
         try:
-            response = requests.post(BINANCE_P2P_URL, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
+            return await loop.run_in_executor(self.api.executor, self.api.fetch, "", None, key, payload)
+        except ApiError as e:
             logging.error(f"Error fetching Binance P2P data for {fiat} ({trade_type}): {e}")
-            return None
-    
-    def get_best_prices(self, fiat):
-        best_buy, best_sell = None, None
-        best_buy_merchant, best_sell_merchant = "Unknown", "Unknown"
-        
-        # Fetch BUY offers
-        buy_data = self.fetch_data(asset="USDT", fiat=fiat, trade_type="BUY", page=1, rows=10)
-        buy_prices = []
-        buy_merchants = {}
-        if buy_data and "data" in buy_data:
-            for adv in buy_data["data"]:
-                price = adv.get("adv", {}).get("price")
-                merchant_name = adv.get("advertiser", {}).get("nickName", "Unknown")
-                if price:
-                    try:
-                        float_price = float(price)
-                        buy_prices.append(float_price)
-                        buy_merchants[float_price] = merchant_name
-                    except ValueError:
-                        continue
-        if buy_prices:
-            best_buy = min(buy_prices)
-            best_buy_merchant = buy_merchants.get(best_buy, "Unknown")
-        
-        
-        sell_data = self.fetch_data(asset="USDT", fiat=fiat, trade_type="SELL", page=1, rows=10)
-        sell_prices = []
-        sell_merchants = {}
-        if sell_data and "data" in sell_data:
-            for adv in sell_data["data"]:
-                price = adv.get("adv", {}).get("price")
-                merchant_name = adv.get("advertiser", {}).get("nickName", "Unknown")
-                if price:
-                    try:
-                        float_price = float(price)
-                        sell_prices.append(float_price)
-                        sell_merchants[float_price] = merchant_name
-                    except ValueError:
-                        continue
-        if sell_prices:
-            best_sell = max(sell_prices)
-            best_sell_merchant = sell_merchants.get(best_sell, "Unknown")
-        
-        return best_buy, best_sell, best_buy_merchant, best_sell_merchant
+            return None, b""
+
+    def fetch_data(self, asset="USDT", fiat="USD", trade_type="BUY", page=1, rows=10):
+        return asyncio.run(self.fetch_page(asset, fiat, trade_type, page, rows))[0]
+
+    async def fetch_side(self, asset, fiat, trade_type):
+        start = time.perf_counter()
+        pages = await asyncio.gather(*[
+            self.fetch_page(asset=asset, fiat=fiat, trade_type=trade_type, page=page, rows=self.rows)
+            for page in range(1, self.pages + 1)
+        ])
+        advs = []
+        # Digest of the raw page bodies, so an unchanged side skips parsing.
+        digest = hashlib.blake2b(digest_size=16)
+        for data, page_digest in pages:
+            digest.update(page_digest)
+            if data and data.get("data"):
+                advs.extend(data["data"])
+        metrics.observe("fetch", time.perf_counter() - start, exchange=self.name, fiat=fiat, side=trade_type)
+        return advs, digest.digest()
+
+    async def fetch_all(self, fiats, asset="USDT", sides=SIDES):
+        jobs = [(fiat, trade_type) for fiat in fiats for trade_type in sides]
+        results = await asyncio.gather(*[self.fetch_side(asset, fiat, trade_type) for fiat, trade_type in jobs])
+        return dict(zip(jobs, results))
+
+    def parse_offers(self, advs, fiat, side):
+        offers = []
+        for adv in advs:
+            ad = adv.get("adv", {})
+            price = ad.get("price")
+            merchant_name = adv.get("advertiser", {}).get("nickName", "Unknown")
+            if not price:
+                continue
+            try:
+                offers.append(Offer(
+                    float(price), merchant_name, side, fiat, self.name,
+                    to_amount(ad.get("minSingleTransAmount")), to_amount(ad.get("maxSingleTransAmount")),
+                    to_amount(ad.get("surplusAmount")),
+                    payment_methods([method.get("identifier") for method in ad.get("tradeMethods") or []]),
+                ))
+            except ValueError:
+                continue
+        return offers
+
+    async def fetch_offers(self, fiats, sides=SIDES):
+        with metrics.span("scrape", exchange=self.name):
+            start = time.monotonic()
+            advs = await self.fetch_all(fiats, asset=self.asset, sides=sides)
+            logging.info(f"Fetched Binance {self.asset} {'/'.join(sides)} offers for {len(fiats)} fiats in {time.monotonic() - start:.2f}s")
+            offers = {}
+            for fiat in fiats:
+                parsed = {}
+                for side in sides:
+                    side_advs, digest = advs[(fiat, side)]
+                    with metrics.span("parse", exchange=self.name, fiat=fiat, side=side):
+                        parsed[side] = self.parsed.parse((self.asset, fiat, side), digest, self.parse_offers, side_advs, fiat, side)
+                offers[fiat] = OfferBook(self.name, fiat, parsed.get("BUY", ()), parsed.get("SELL", ()), asset=self.asset)
+            return offers
@@ -1,64 +1,106 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys 
-import time
 import logging
-from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, ElementClickInterceptedException
+from Src.browser_pool import get_pool
+from Src.offers import SIDES, Offer, OfferBook, ParseCache, to_amount, payload_digest, payment_methods
+from Src.scraper_base import Scraper, rate_limiter
+from Src.extract import extract_rows
+from Src import metrics
+from Src.api_client import ApiClient, ApiError, offers_with_fallback
 
+OKX_API_URL = "https://www.okx.com"
+OKX_BOOKS_PATH = "/v3/c2c/tradingOrders/books"
 
-class OKXScraper:
+
+class OKXScraper(Scraper):
     name = "okx"
     supported_fiats = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
+    supported_assets = ("USDT", "USDC", "BTC", "ETH")
+    max_concurrency = 2
+    supports_batch = False
+    rate_limit = 5
+    rate_burst = 16
+    browser = True
+    row_spec = {
+        "price": "//span[@class='price']",
+        "merchant": "//a[contains(@class, 'Tags_merchantLink__u5a8b')]",
+        # Limits and payment methods are looked up inside each offer's row.
+        "limits": ".//div[contains(@class, 'quantity-and-limit')]//span[contains(., '-')]",
+        "payment": ".//div[contains(@class, 'payment-method')]//span[contains(@class, 'payment-name')]",
+    }
     
-    def __init__(self):
+    def __init__(self, mode="auto", api_url=OKX_API_URL):
         self.logger = logging.getLogger("OKXScraper")
+        self.mode = mode
+        self.api = ApiClient(self.name, api_url, limiter=rate_limiter(self.rate_limit, self.rate_burst))
+        self.parsed = ParseCache()
     
-    def get_best_prices(self, fiat):
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--log-level=3")
-        
-        driver = webdriver.Chrome(options=chrome_options)
-        
+    def get_offers_many(self, fiats, sides=SIDES):
+        return offers_with_fallback(self, fiats, sides)
+
+    def fetch_api_side(self, fiat, side):
+        # OKX lists ads from the advertiser's side: a user BUY fills a sell ad.
+        book_side = "sell" if side == "BUY" else "buy"
+        with metrics.span("fetch", exchange=self.name, fiat=fiat, side=side):
+            data, digest = self.api.fetch(OKX_BOOKS_PATH, {
+                "quoteCurrency": fiat.lower(),
+                "baseCurrency": self.asset.lower(),
+                "side": book_side,
+                "paymentMethod": "all",
+                "userType": "all",
+            }, key=(self.name, self.asset, fiat, side, 1))
+        if not isinstance(data, dict) or data.get("code") not in (0, "0") or not isinstance(data.get("data"), dict):
+            raise ApiError(f"Unexpected OKX response for {fiat} ({side}): {str(data)[:200]}")
+        with metrics.span("parse", exchange=self.name, fiat=fiat, side=side):
+            return self.parsed.parse((self.asset, fiat, side), digest, self.parse_api_offers, data["data"].get(book_side) or [], fiat, side)
+
+    def parse_api_offers(self, ads, fiat, side):
+        offers = []
+        for ad in ads:
+            try:
+                offers.append(Offer(
+                    float(ad["price"]), ad.get("nickName") or "N/A", side, fiat, self.name,
+                    to_amount(ad.get("quoteMinAmountPerOrder")), to_amount(ad.get("quoteMaxAmountPerOrder")),
+                    to_amount(ad.get("availableAmount")), payment_methods(ad.get("paymentMethods")),
+                ))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return offers
+
+    def get_browser_offers(self, fiats):
+        with get_pool("chrome").lease() as driver:
+            return {fiat: self.scrape_offers(driver, fiat) for fiat in fiats}
+
+    def scrape_offers(self, driver, fiat):
+        # Selenium is only imported once a browser is actually needed.
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from Src.waits import Waiter
+
         try:
-            wait = WebDriverWait(driver, 20)
-            driver.get("https://www.okx.com/p2p-markets")
-            time.sleep(5)
+            waiter = Waiter(driver, self.name)
+            waiter.load("https://www.okx.com/p2p-markets")
             driver.refresh()
-            time.sleep(5)
+            waiter.page_ready()
             
-            data_rows = []
+            offers = {"BUY": [], "SELL": []}
+            price_xpath = self.row_spec["price"]
+            marker = None
             
             def scrape_and_collect(price_type):
-                nonlocal driver, wait, data_rows, fiat
+                nonlocal driver, waiter, fiat, marker
                 page_num = 1
                 max_pages = 2
                 has_next_page = True
                 while has_next_page and page_num <= max_pages:
                     try:
-                        price_wait = WebDriverWait(driver, 15)
-                        prices = price_wait.until(EC.presence_of_all_elements_located((By.XPATH, "//span[@class='price']")))
-                        merchants = driver.find_elements(By.XPATH, "//a[contains(@class, 'Tags_merchantLink__u5a8b')]")
-                        if prices:
-                            self.logger.info(f"Scraped {len(prices)} prices on page {page_num} for {price_type}")
-                            for i, price_element in enumerate(prices):
-                                try:
-                                    price_text = price_element.text.strip()
-                                    merchant_name = merchants[i].text.strip() if i < len(merchants) else "N/A"
-                                    if price_text:
-                                        data_rows.append({
-                                            'Currency': fiat,
-                                            'PriceType': price_type,
-                                            'Price': price_text,
-                                            'Merchant': merchant_name,
-                                            'Page': page_num
-                                        })
-                                except StaleElementReferenceException:
-                                    continue
+                        waiter.rows(price_xpath, marker, name="price_rows")
+                        marker = waiter.snapshot(price_xpath)
+                        rows = extract_rows(driver, self.row_spec, self.name)
+                        if rows:
+                            self.logger.info(f"Scraped {len(rows)} prices on page {page_num} for {price_type}")
+                            with metrics.span("parse", exchange=self.name, fiat=fiat, side=price_type):
+                                offers[price_type].extend(self.parsed.parse(
+                                    (self.asset, fiat, price_type, page_num), payload_digest(rows), self.parse_rows, rows, fiat, price_type
+                                ))
                         else:
                             self.logger.info(f"No prices found on page {page_num} for {price_type}")
                         
@@ -69,10 +111,8 @@ class OKXScraper:
                             next_button = next_buttons[0]
                             if next_button.is_displayed() and 'disabled' not in next_button.get_attribute('class'):
                                 driver.execute_script("arguments[0].scrollIntoView(true);", next_button)
-                                time.sleep(1)
                                 driver.execute_script("arguments[0].click();", next_button)
                                 page_num += 1
-                                time.sleep(5)
                             else:
                                 has_next_page = False
                         else:
@@ -89,79 +129,65 @@ class OKXScraper:
             max_attempts = 3
             for attempt in range(max_attempts):
                 try:
-                    dropdown = wait.until(EC.element_to_be_clickable((By.XPATH, dropdown_xpath)))
+                    dropdown = waiter.clickable(dropdown_xpath, "fiat_dropdown")
                     driver.execute_script("arguments[0].scrollIntoView(true);", dropdown)
-                    time.sleep(1)
                     driver.execute_script("arguments[0].click();", dropdown)
-                    WebDriverWait(driver, 5).until(EC.visibility_of_element_located((By.XPATH, search_box_xpath)))
+                    waiter.visible(search_box_xpath, "fiat_search_box")
                     break
                 except Exception as e:
                     self.logger.error(f"Attempt {attempt+1} to click dropdown failed: {e}")
                     if attempt == max_attempts - 1:
                         raise e
-                    time.sleep(2)
+                    waiter.quiet()
             
-            search_box = wait.until(EC.visibility_of_element_located((By.XPATH, search_box_xpath)))
+            search_box = waiter.visible(search_box_xpath, "fiat_search_box")
             search_box.clear()
             search_box.send_keys(Keys.CONTROL + "a")
             search_box.send_keys(Keys.DELETE)
             driver.execute_script("arguments[0].value = '';", search_box)
-            time.sleep(1)
-            for char in fiat:
-                search_box.send_keys(char)
-                time.sleep(0.1)
-            time.sleep(2)
-            active_item = wait.until(EC.element_to_be_clickable((By.XPATH, active_item_xpath)))
+            search_box.send_keys(fiat)
+            waiter.quiet("fiat_filter")
+            marker = waiter.snapshot(price_xpath)
+            active_item = waiter.clickable(active_item_xpath, "fiat_option")
             driver.execute_script("arguments[0].click();", active_item)
             self.logger.info(f"Selected fiat currency: {fiat}")
-            time.sleep(5)
             
             # Scrape Buy and Sell Offers
-            buy_tab_xpath = "//a[contains(@class,'side-item') and contains(@href,'buy-usdt') and text()='Buy']"
-            sell_tab_xpath = "//a[contains(@class,'side-item') and contains(@href,'sell-usdt') and text()='Sell']"
+            asset = self.asset.lower()
+            buy_tab_xpath = f"//a[contains(@class,'side-item') and contains(@href,'buy-{asset}') and text()='Buy']"
+            sell_tab_xpath = f"//a[contains(@class,'side-item') and contains(@href,'sell-{asset}') and text()='Sell']"
             
-            buy_tab = wait.until(EC.element_to_be_clickable((By.XPATH, buy_tab_xpath)))
+            buy_tab = waiter.clickable(buy_tab_xpath, "buy_tab")
             driver.execute_script("arguments[0].click();", buy_tab)
             self.logger.info("Clicked Buy tab")
-            time.sleep(5)
-            scrape_and_collect("Buy")
+            scrape_and_collect("BUY")
             
-            sell_tab = wait.until(EC.element_to_be_clickable((By.XPATH, sell_tab_xpath)))
+            marker = waiter.snapshot(price_xpath)
+            sell_tab = waiter.clickable(sell_tab_xpath, "sell_tab")
             driver.execute_script("arguments[0].click();", sell_tab)
             self.logger.info("Clicked Sell tab")
-            time.sleep(5)
-            scrape_and_collect("Sell")
+            scrape_and_collect("SELL")
             
-            self.logger.info(f"Data rows collected: {data_rows}")
-            
-            buy_prices = []
-            sell_prices = []
-            buy_merchants = {}
-            sell_merchants = {}
-            for row in data_rows:
-                try:
-                    price_numeric = row['Price'].split()[0]
-                    price_val = float(price_numeric.replace(',', ''))
-                    if row['PriceType'] == "Buy":
-                        buy_prices.append(price_val)
-                        buy_merchants[price_val] = row['Merchant']
-                    elif row['PriceType'] == "Sell":
-                        sell_prices.append(price_val)
-                        sell_merchants[price_val] = row['Merchant']
-                except Exception as ex:
-                    self.logger.error(f"Error processing row {row}: {ex}")
-                    continue
-            
-            best_buy = min(buy_prices) if buy_prices else None
-            best_sell = max(sell_prices) if sell_prices else None
-            best_buy_merchant = buy_merchants.get(best_buy, "Unknown") if best_buy is not None else "Unknown"
-            best_sell_merchant = sell_merchants.get(best_sell, "Unknown") if best_sell is not None else "Unknown"
-            
-            return best_buy, best_sell, best_buy_merchant, best_sell_merchant
+            self.logger.info(f"Offers collected: {len(offers['BUY'])} buy, {len(offers['SELL'])} sell")
+            return OfferBook(self.name, fiat, offers["BUY"], offers["SELL"], asset=self.asset)
             
         except Exception as e:
-            self.logger.error(f"Error in get_best_prices: {e}")
-            return None, None, "Unknown", "Unknown"
-        finally:
-            driver.quit()
-           
+            self.logger.error(f"Error in get_offers_many: {e}")
+            return OfferBook(self.name, fiat, asset=self.asset)
+
+    def parse_rows(self, rows, fiat, side):
+        offers = []
+        for row in rows:
+            if not row['price']:
+                continue
+            try:
+                price_numeric = row['price'].split()[0]
+                price_val = float(price_numeric.replace(',', ''))
+                offers.append(Offer(
+                    price_val, row['merchant'] or "N/A", side, fiat, self.name, row['min_amount'], row['max_amount'],
+                    payment_methods=payment_methods(row['payment_methods']),
+                ))
+            except Exception as ex:
+                self.logger.error(f"Error processing row {row}: {ex}")
+                continue
+        return offers
@@ -1,166 +1,200 @@
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
-import datetime
 import logging
-import sys
-import setuptools._distutils as distutils
-sys.modules["distutils"] = distutils
+from Src.browser_pool import get_pool
+from Src.offers import SIDES, Offer, OfferBook, ParseCache, to_amount, payload_digest, payment_methods
+from Src.scraper_base import Scraper, rate_limiter
+from Src.extract import extract_rows
+from Src import metrics
+from Src.api_client import ApiClient, ApiError, offers_with_fallback
 
+PAXFUL_API_URL = "https://paxful.com"
+PAXFUL_OFFERS_PATH = "/rest/v1/offers"
+# Marketplace page slug for each asset.
+PAXFUL_SLUGS = {"USDT": "tether", "BTC": "bitcoin", "ETH": "ethereum"}
 
-class PaxfulScraper:
+
+class PaxfulScraper(Scraper):
     name = "paxful"
     supported_fiats = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
+    supported_assets = tuple(PAXFUL_SLUGS)
+    max_concurrency = 1
+    supports_batch = True
+    rate_limit = 2
+    rate_burst = 16
+    browser = True
+    row_spec = {
+        "price": "//p[@class='JYvOZ text-right m-0']",
+        "merchant": "//a[@class='DKSO-']",
+        # Limits and payment methods are looked up inside each offer's row.
+        "limits": ".//p[contains(@class, 'text-right') and contains(., ' - ')]",
+        "payment": ".//a[contains(@href, '/buy-') or contains(@href, '/sell-')]//p[1]",
+    }
     
-    def __init__(self):
+    def __init__(self, mode="auto", api_url=PAXFUL_API_URL, rows=20):
         self.logger = logging.getLogger("PaxfulScraper")
+        self.mode = mode
+        self.rows = rows
+        self.api = ApiClient(self.name, api_url, limiter=rate_limiter(self.rate_limit, self.rate_burst))
+        self.parsed = ParseCache()
     
     def scrape_prices(self, driver, url, currencies, trade_type):
-        results_data = {
-            'Currency': [],
-            'Price': [],
-            'Trade_Type': [],
-            'Date_Scraped': [],
-            'Merchant_Name': []
-        }
-        current_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Selenium is only imported once a browser is actually needed.
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from Src.waits import Waiter
+
+        results = {}
+        price_xpath = self.row_spec["price"]
         self.logger.info(f"Navigating to {url} to scrape {trade_type} prices...")
-        driver.get(url)
-        time.sleep(3)
+        waiter = Waiter(driver, self.name)
+        waiter.load(url)
         
         self.logger.info("Clicking country selection button...")
-        country_button = WebDriverWait(driver, 10).until(
+        country_button = waiter.until(
             EC.element_to_be_clickable((By.XPATH,
-                "//button[@class='qa-search-country-cta d-flex align-items-center btn-square btn btn-light btn-lg btn-block']"))
+                "//button[@class='qa-search-country-cta d-flex align-items-center btn-square btn btn-light btn-lg btn-block']")),
+            "country_button"
         )
         country_button.click()
         
         self.logger.info("Selecting 'Worldwide' option...")
-        worldwide_option = WebDriverWait(driver, 10).until(
+        worldwide_option = waiter.until(
             EC.element_to_be_clickable((By.XPATH,
-                "//div[@data-testid='searchable-select-option-text' and text()='Worldwide']"))
+                "//div[@data-testid='searchable-select-option-text' and text()='Worldwide']")),
+            "worldwide_option"
         )
         worldwide_option.click()
         
         for currency in currencies:
-            self.logger.info(f"Processing currency: {currency} for {trade_type}")
-            secondary_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH,
-                    "//button[@class='_0nTtV btn btn-outline-secondary btn-md']"))
-            )
-            secondary_button.click()
-            time.sleep(5)
-            
-            self.logger.info("Clicking currency container to focus input...")
-            currency_container = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH,
-                    "//*[contains(@class, 'css-z89e5k') and contains(@class, 'text-gray-600') and contains(@class, 'label-md')]"))
-            )
-            driver.execute_script("arguments[0].scrollIntoView(true);", currency_container)
-            driver.execute_script("arguments[0].click();", currency_container)
-            time.sleep(1)
-            
-            self.logger.info("Locating currency input element...")
-            currency_input = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH,
-                    "//div[contains(@class, 'css')]//div[contains(@class, 'text-gray-900')]//input"))
-            )
-            currency_input.clear()
-            currency_input.send_keys(currency)
-            time.sleep(1)
+            try:
+                self.logger.info(f"Processing currency: {currency} for {trade_type}")
+                secondary_button = waiter.until(
+                    EC.element_to_be_clickable((By.XPATH,
+                        "//button[@class='_0nTtV btn btn-outline-secondary btn-md']")),
+                    "currency_button"
+                )
+                secondary_button.click()
             
-            self.logger.info("Selecting specific currency option...")
-            currency_option = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH,
-                    "//div[contains(@class,'css')]//div[@class='d-flex justify-content-between align-items-center w-100 label-md']"))
-            )
-            currency_option.click()
+                self.logger.info("Clicking currency container to focus input...")
+                currency_container = waiter.until(
+                    EC.element_to_be_clickable((By.XPATH,
+                        "//*[contains(@class, 'css-z89e5k') and contains(@class, 'text-gray-600') and contains(@class, 'label-md')]")),
+                    "currency_container"
+                )
+                driver.execute_script("arguments[0].scrollIntoView(true);", currency_container)
+                driver.execute_script("arguments[0].click();", currency_container)
             
-            self.logger.info("Clicking Find Offers...")
-            find_option = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH,
-                    "//button[@class='d-flex align-items-center w-100 justify-content-between btn btn-primary btn-lg']"))
-            )
-            find_option.click()
-            self.logger.info("Waiting for results to load...")
-            time.sleep(8)
+                self.logger.info("Locating currency input element...")
+                currency_input = waiter.until(
+                    EC.presence_of_element_located((By.XPATH,
+                        "//div[contains(@class, 'css')]//div[contains(@class, 'text-gray-900')]//input")),
+                    "currency_input"
+                )
+                currency_input.clear()
+                currency_input.send_keys(currency)
+                waiter.quiet("currency_filter")
             
-            self.logger.info(f"Scraping {trade_type} prices for {currency}...")
-            try:
-                price_elements = WebDriverWait(driver, 10).until(
-                    EC.presence_of_all_elements_located((By.XPATH, "//p[@class='JYvOZ text-right m-0']"))
+                self.logger.info("Selecting specific currency option...")
+                currency_option = waiter.until(
+                    EC.element_to_be_clickable((By.XPATH,
+                        "//div[contains(@class,'css')]//div[@class='d-flex justify-content-between align-items-center w-100 label-md']")),
+                    "currency_option"
                 )
-                merchant_elements = WebDriverWait(driver, 10).until(
-                    EC.presence_of_all_elements_located((By.XPATH, "//a[@class='DKSO-']"))
+                currency_option.click()
+            
+                self.logger.info("Clicking Find Offers...")
+                find_option = waiter.until(
+                    EC.element_to_be_clickable((By.XPATH,
+                        "//button[@class='d-flex align-items-center w-100 justify-content-between btn btn-primary btn-lg']")),
+                    "find_offers"
                 )
-                if price_elements:
-                    self.logger.info(f"Found {len(price_elements)} {trade_type} price entries for {currency}")
-                    for i, price_element in enumerate(price_elements):
-                        price_text = price_element.text.strip()
-                        merchant_name = merchant_elements[i].text.strip() if i < len(merchant_elements) else "Unknown"
-                        results_data['Currency'].append(currency)
-                        results_data['Price'].append(price_text)
-                        results_data['Trade_Type'].append(trade_type)
-                        results_data['Date_Scraped'].append(current_date)
-                        results_data['Merchant_Name'].append(merchant_name)
-                        self.logger.info(f"Recorded {trade_type} price: {price_text}, Merchant: {merchant_name}")
-                else:
-                    self.logger.warning(f"No {trade_type} price data found for {currency}")
+                marker = waiter.snapshot(price_xpath)
+                find_option.click()
+                self.logger.info("Waiting for results to load...")
+            
+                self.logger.info(f"Scraping {trade_type} prices for {currency}...")
+                try:
+                    waiter.rows(price_xpath, marker, name="price_rows")
+                    rows = extract_rows(driver, self.row_spec, self.name)
+                    if rows:
+                        self.logger.info(f"Found {len(rows)} {trade_type} price entries for {currency}")
+                        results[currency] = rows
+                    else:
+                        self.logger.warning(f"No {trade_type} price data found for {currency}")
+                except Exception as e:
+                    self.logger.error(f"Error scraping {trade_type} prices for {currency}: {str(e)}")
             except Exception as e:
-                self.logger.error(f"Error scraping {trade_type} prices for {currency}: {str(e)}")
-            time.sleep(2)
+                self.logger.error(f"Error processing currency '{currency}' for {trade_type}: {e}")
         
-        return results_data
+        return results
     
-    def extract_best_prices(self, all_prices, currency):
-        buy_prices = []
-        sell_prices = []
-        buy_merchants = {}
-        sell_merchants = {}
-        
-        for i in range(len(all_prices['Currency'])):
-            if all_prices['Currency'][i] == currency:
-                price_str = all_prices['Price'][i]
-                try:
-                    price_clean = ''.join(c for c in price_str if c.isdigit() or c == '.')
-                    price = float(price_clean)
-                    if all_prices['Trade_Type'][i] == 'BUY':
-                        buy_prices.append(price)
-                        buy_merchants[price] = all_prices['Merchant_Name'][i]
-                    elif all_prices['Trade_Type'][i] == 'SELL':
-                        sell_prices.append(price)
-                        sell_merchants[price] = all_prices['Merchant_Name'][i]
-                except ValueError:
-                    continue
-        
-        best_buy = min(buy_prices) if buy_prices else None
-        best_sell = max(sell_prices) if sell_prices else None
-        best_buy_merchant = buy_merchants.get(best_buy, "Unknown") if best_buy is not None else "Unknown"
-        best_sell_merchant = sell_merchants.get(best_sell, "Unknown") if best_sell is not None else "Unknown"
-        return best_buy, best_sell, best_buy_merchant, best_sell_merchant
+    def parse_rows(self, rows, currency, trade_type):
+        return self.parsed.parse((self.asset, currency, trade_type), payload_digest(rows), self.extract_offers, rows, currency, trade_type)
+
+    def extract_offers(self, rows, currency, trade_type):
+        offers = []
+        for row in rows:
+            try:
+                price_clean = ''.join(c for c in row['price'] if c.isdigit() or c == '.')
+                price = float(price_clean)
+            except ValueError:
+                continue
+            offers.append(Offer(
+                price, row['merchant'] or "Unknown", trade_type, currency, self.name, row['min_amount'], row['max_amount'],
+                payment_methods=payment_methods(row['payment_methods']),
+            ))
+        return offers
     
-    def get_best_prices(self, fiat):
+    def get_offers_many(self, fiats, sides=SIDES):
+        return offers_with_fallback(self, fiats, sides)
 
-        
-        # Launch Chrome in headless mode.
-        driver = uc.Chrome(headless=False)
+    def fetch_api_side(self, fiat, side):
+        with metrics.span("fetch", exchange=self.name, fiat=fiat, side=side):
+            data, digest = self.api.fetch(PAXFUL_OFFERS_PATH, {
+                "transformResponse": "web",
+                "crypto": self.asset.lower(),
+                "currency": fiat,
+                "type": side.lower(),
+                "limit": self.rows,
+            }, key=(self.name, self.asset, fiat, side, (1, self.rows)))
+        if not isinstance(data, dict) or not isinstance(data.get("data"), list):
+            raise ApiError(f"Unexpected Paxful response for {fiat} ({side}): {str(data)[:200]}")
+        with metrics.span("parse", exchange=self.name, fiat=fiat, side=side):
+            return self.parsed.parse((self.asset, fiat, side), digest, self.parse_api_offers, data["data"], fiat, side)
+
+    def parse_api_offers(self, offers, fiat, side):
+        entries = []
+        for offer in offers:
+            price = offer.get("fiatPricePerCrypto") or offer.get("fiatPricePerBtc")
+            try:
+                entries.append(Offer(
+                    float(price), offer.get("username") or "Unknown", side, fiat, self.name,
+                    to_amount(offer.get("fiatAmountRangeMin")), to_amount(offer.get("fiatAmountRangeMax")),
+                    payment_methods=payment_methods(offer.get("paymentMethodName")),
+                ))
+            except (TypeError, ValueError):
+                continue
+        return entries
+
+    def get_browser_offers(self, fiats):
+        with get_pool("uc").lease() as driver:
+            return self.scrape_offers(driver, fiats)
+
+    def scrape_offers(self, driver, fiats):
         try:
-            currencies = [fiat]
-            buy_results = self.scrape_prices(driver, "https://paxful.com/buy-tether/", currencies, "BUY")
-            sell_results = self.scrape_prices(driver, "https://paxful.com/sell-tether/", currencies, "SELL")
-            all_results = {
-                'Currency': buy_results['Currency'] + sell_results['Currency'],
-                'Price': buy_results['Price'] + sell_results['Price'],
-                'Trade_Type': buy_results['Trade_Type'] + sell_results['Trade_Type'],
-                'Date_Scraped': buy_results['Date_Scraped'] + sell_results['Date_Scraped'],
-                'Merchant_Name': buy_results['Merchant_Name'] + sell_results['Merchant_Name']
-            }
-            return self.extract_best_prices(all_results, fiat)
+            slug = PAXFUL_SLUGS[self.asset]
+            buy_rows = self.scrape_prices(driver, f"https://paxful.com/buy-{slug}/", fiats, "BUY")
+            sell_rows = self.scrape_prices(driver, f"https://paxful.com/sell-{slug}/", fiats, "SELL")
+            with metrics.span("parse", exchange=self.name):
+                return {
+                    fiat: OfferBook(
+                        self.name,
+                        fiat,
+                        self.parse_rows(buy_rows.get(fiat, []), fiat, "BUY"),
+                        self.parse_rows(sell_rows.get(fiat, []), fiat, "SELL"),
+                        asset=self.asset,
+                    )
+                    for fiat in fiats
+                }
         except Exception as e:
-            self.logger.error(f"Error in get_best_prices: {e}")
-            return None, None, "Unknown", "Unknown"
-        finally:
-            driver.quit()
-
+            self.logger.error(f"Error in get_offers_many: {e}")
+            return {fiat: OfferBook(self.name, fiat, asset=self.asset) for fiat in fiats}
@@ -1,46 +1,64 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
 import logging
-from selenium.common.exceptions import StaleElementReferenceException
+from Src.browser_pool import get_pool
+from Src.offers import SIDES, Offer, OfferBook, ParseCache, to_amount, payload_digest, payment_methods
+from Src.scraper_base import Scraper, rate_limiter
+from Src.extract import extract_rows
+from Src import metrics
+from Src.api_client import ApiClient, ApiError, offers_with_fallback
 
-class RemitanoScraper:
+REMITANO_API_URL = "https://remitano.com"
+REMITANO_OFFERS_PATH = "/api/v1/offers"
+
+class RemitanoScraper(Scraper):
     name = "remintano"
     supported_fiats = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
+    supported_assets = ("USDT", "USDC", "BTC", "ETH")
+    max_concurrency = 2
+    supports_batch = True
+    rate_limit = 5
+    rate_burst = 16
+    browser = True
+    row_spec = {
+        "price": "//h6[@class='css-146c3p1 r-1loqt21']",
+        "merchant": "//a[contains(@href, '/global/profile')]/div[@class='css-175oi2r']/div[@class='css-146c3p1']",
+        # Limits and payment methods are looked up inside each offer's row.
+        "limits": ".//div[@dir='auto' and starts-with(normalize-space(.), 'Limit')]",
+        "payment": ".//div[@data-testid='payment-method-name']",
+    }
     
-    def __init__(self):
+    def __init__(self, mode="auto", api_url=REMITANO_API_URL):
         self.logger = logging.getLogger("RemitanoScraper")
+        self.mode = mode
+        self.api = ApiClient(self.name, api_url, limiter=rate_limiter(self.rate_limit, self.rate_burst))
+        self.parsed = ParseCache()
     
     def scrape(self, driver, url, trade_type, currencies):
-        driver.get(url)
-        wait = WebDriverWait(driver, 20)
-        time.sleep(5)
+        # Selenium is only imported once a browser is actually needed.
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from Src.waits import Waiter
+
+        waiter = Waiter(driver, self.name)
+        waiter.load(url)
         
         pop_up_xpath = "//button[@role='button']//div[@dir='auto' and contains(@class,'css-146c3p1') and normalize-space(text())='Close']"
         target_xpath = "(//div[@class='css-175oi2r r-1loqt21 r-1otgn73'])[10]"
-        price_xpath = "//h6[@class='css-146c3p1 r-1loqt21']"
-        merchant_xpath = "//a[contains(@href, '/global/profile')]/div[@class='css-175oi2r']/div[@class='css-146c3p1']"
+        price_xpath = self.row_spec["price"]
         
         all_prices = {}
         
         try:
-            pop_up_elem = wait.until(EC.element_to_be_clickable((By.XPATH, pop_up_xpath)))
+            pop_up_elem = waiter.until(EC.element_to_be_clickable((By.XPATH, pop_up_xpath)), "popup", "popup")
             pop_up_elem.click()
             self.logger.info(f"Pop-up found and removed on {trade_type} page.")
         except Exception as e:
             self.logger.info(f"Pop-up not found or not clickable on {trade_type} page.")
            
         try:
-            time.sleep(2)
-            target_elem = wait.until(EC.element_to_be_clickable((By.XPATH, target_xpath)))
+            target_elem = waiter.clickable(target_xpath, "currency_selector")
             driver.execute_script("arguments[0].scrollIntoView(true);", target_elem)
-            time.sleep(1)
             driver.execute_script("arguments[0].click();", target_elem)
             self.logger.info(f"Clicked on currency selector on {trade_type} page.")
-            time.sleep(2)
         except Exception as e:
             self.logger.error(f"Currency selector button not found or not clickable on {trade_type} page: {e}")
             return all_prices
@@ -48,36 +66,25 @@ class RemitanoScraper:
         for currency in currencies:
             try:
                 self.logger.info(f"Processing currency: {currency} for {trade_type}")
-                time.sleep(3)
                 currency_xpath = f"//div[@data-testid='dropdown-menu-item fiat-currency-option-{currency}']"
-                currency_elem = wait.until(EC.element_to_be_clickable((By.XPATH, currency_xpath)))
+                currency_elem = waiter.clickable(currency_xpath, "currency_option")
+                marker = waiter.snapshot(price_xpath)
                 driver.execute_script("arguments[0].scrollIntoView(true);", currency_elem)
-                time.sleep(1)
                 driver.execute_script("arguments[0].click();", currency_elem)
                 self.logger.info(f"Selected currency: {currency}")
-                time.sleep(5)
                 
                 try:
-                    price_elements = wait.until(EC.presence_of_all_elements_located((By.XPATH, price_xpath)))
-                    merchant_elements = wait.until(EC.presence_of_all_elements_located((By.XPATH, merchant_xpath)))
+                    waiter.rows(price_xpath, marker, name="price_rows")
+                    rows = extract_rows(driver, self.row_spec, self.name)
                     entries = []
-                    if price_elements:
-                        self.logger.info(f"Found {len(price_elements)} price elements for {currency} on {trade_type} page")
-                        for i, price_element in enumerate(price_elements):
-                            try:
-                                price_text = price_element.text.strip().replace(',', '')
-                                merchant_name = "Unknown"
-                                if i < len(merchant_elements):
-                                    merchant_name = merchant_elements[i].text.strip()
-                                if price_text and merchant_name and merchant_name.lower() != "unknown":
-                                    self.logger.info(f"{currency}: {price_text}, Merchant: {merchant_name}")
-                                    entries.append((price_text, merchant_name))
-                            except StaleElementReferenceException:
-                                self.logger.warning("Stale element reference encountered, skipping this price")
-                                continue
-                            except Exception as e:
-                                self.logger.error(f"Error processing price: {e}")
-                                continue
+                    if rows:
+                        self.logger.info(f"Found {len(rows)} price elements for {currency} on {trade_type} page")
+                        for row in rows:
+                            price_text = row['price'].replace(',', '')
+                            merchant_name = row['merchant'] or "Unknown"
+                            if price_text and merchant_name and merchant_name.lower() != "unknown":
+                                self.logger.info(f"{currency}: {price_text}, Merchant: {merchant_name}")
+                                entries.append((price_text, merchant_name, row['min_amount'], row['max_amount'], row['payment_methods']))
                         if entries:
                             all_prices[currency] = entries
                             self.logger.info(f"Extracted {len(entries)} valid prices for {currency} on {trade_type} page")
@@ -89,65 +96,75 @@ class RemitanoScraper:
                     self.logger.error(f"Error extracting data for {currency} on {trade_type} page: {e}")
                 
                 if currency != currencies[-1]:
-                    target_elem = wait.until(EC.element_to_be_clickable((By.XPATH, target_xpath)))
+                    target_elem = waiter.clickable(target_xpath, "currency_selector")
                     driver.execute_script("arguments[0].scrollIntoView(true);", target_elem)
-                    time.sleep(1)
                     driver.execute_script("arguments[0].click();", target_elem)
                     self.logger.info(f"Reopened currency selector for next currency on {trade_type} page.")
-                    time.sleep(2)
                     
             except Exception as e:
                 self.logger.error(f"Error processing currency '{currency}' on {trade_type} page: {e}")
         
         return all_prices
     
-    def get_best_prices(self, fiat):
+    def get_offers_many(self, fiats, sides=SIDES):
+        return offers_with_fallback(self, fiats, sides)
 
-        
-        chrome_options = Options()
-        chrome_options.add_argument("--start-maximized")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--log-level=3")
-        
-        driver = webdriver.Chrome(options=chrome_options)
+    def fetch_api_side(self, fiat, side):
+        # Remitano offer_type is the advertiser's side: a user BUY takes a sell offer.
+        with metrics.span("fetch", exchange=self.name, fiat=fiat, side=side):
+            data, digest = self.api.fetch(REMITANO_OFFERS_PATH, {
+                "coin_currency": self.asset.lower(),
+                "fiat_currency": fiat.lower(),
+                "offer_type": "sell" if side == "BUY" else "buy",
+                "page": 1,
+            }, key=(self.name, self.asset, fiat, side, 1))
+        if not isinstance(data, dict) or not isinstance(data.get("offers"), list):
+            raise ApiError(f"Unexpected Remitano response for {fiat} ({side}): {str(data)[:200]}")
+        with metrics.span("parse", exchange=self.name, fiat=fiat, side=side):
+            return self.parsed.parse((self.asset, fiat, side), digest, self.parse_api_offers, data["offers"], fiat, side)
+
+    def parse_api_offers(self, offers, fiat, side):
+        return self.convert_prices([
+            (offer.get("price"), offer.get("username") or "Unknown", offer.get("min_amount"), offer.get("max_amount"), offer.get("payment_method"))
+            for offer in offers
+            if offer.get("price") is not None
+        ], fiat, side)
+
+    def get_browser_offers(self, fiats):
+        with get_pool("chrome").lease() as driver:
+            return self.scrape_offers(driver, fiats)
+
+    def parse_entries(self, entries, fiat, side):
+        return self.parsed.parse((self.asset, fiat, side), payload_digest(entries), self.convert_prices, entries, fiat, side)
+
+    def convert_prices(self, entries, fiat, side):
+        converted = []
+        for price, merchant, min_amount, max_amount, methods in entries:
+            try:
+                converted.append(Offer(
+                    float(price), merchant, side, fiat, self.name, to_amount(min_amount), to_amount(max_amount),
+                    payment_methods=payment_methods(methods),
+                ))
+            except (TypeError, ValueError):
+                continue
+        return converted
+
+    def scrape_offers(self, driver, fiats):
         try:
-            currencies = [fiat]
-            buy_prices = self.scrape(driver, "https://remitano.com/global/p2p/usdt/buy", "BUY", currencies)
-            sell_prices = self.scrape(driver, "https://remitano.com/global/p2p/usdt/sell", "SELL", currencies)
-            
-            def convert_prices(entries):
-                converted = []
-                for price, merchant in entries:
-                    try:
-                        converted.append((float(price), merchant))
-                    except:
-                        continue
-                return converted
-            
-            buy_entries = convert_prices(buy_prices.get(fiat, []))
-            sell_entries = convert_prices(sell_prices.get(fiat, []))
-            
-            best_buy = min(buy_entries, key=lambda x: x[0])[0] if buy_entries else None
-            best_sell = max(sell_entries, key=lambda x: x[0])[0] if sell_entries else None
-            
-            best_buy_merchant = "Unknown"
-            best_sell_merchant = "Unknown"
-            
-            if best_buy is not None:
-                for price, merchant in buy_entries:
-                    if price == best_buy:
-                        best_buy_merchant = merchant
-                        break
-            if best_sell is not None:
-                for price, merchant in sell_entries:
-                    if price == best_sell:
-                        best_sell_merchant = merchant
-                        break
-            
-            return best_buy, best_sell, best_buy_merchant, best_sell_merchant
+            asset = self.asset.lower()
+            buy_prices = self.scrape(driver, f"https://remitano.com/global/p2p/{asset}/buy", "BUY", fiats)
+            sell_prices = self.scrape(driver, f"https://remitano.com/global/p2p/{asset}/sell", "SELL", fiats)
+            with metrics.span("parse", exchange=self.name):
+                return {
+                    fiat: OfferBook(
+                        self.name,
+                        fiat,
+                        self.parse_entries(buy_prices.get(fiat, []), fiat, "BUY"),
+                        self.parse_entries(sell_prices.get(fiat, []), fiat, "SELL"),
+                        asset=self.asset,
+                    )
+                    for fiat in fiats
+                }
         except Exception as e:
-            self.logger.error(f"Error in get_best_prices: {e}")
-            return None, None, "Unknown", "Unknown"
-        finally:
-            driver.quit()
-    
+            self.logger.error(f"Error in get_offers_many: {e}")
+            return {fiat: OfferBook(self.name, fiat, asset=self.asset) for fiat in fiats}
@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import queue
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from Src import metrics
+from Src.depth import walk, summarize
+from Src.offers import SIDES
+
+logger = logging.getLogger("Alerts")
+
+
+class StdoutSink:
+    name = "stdout"
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def send(self, line):
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class SocketSink:
+    # JSON lines over a Unix or TCP socket; reconnects on the next event
+    # after the reader goes away.
+    def __init__(self, address, family=socket.AF_INET, timeout=2.0):
+        self.address = address
+        self.family = family
+        self.timeout = timeout
+        self.name = f"socket:{address}"
+        self.sock = None
+        self.lock = threading.Lock()
+
+    def send(self, line):
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+                    self.sock.settimeout(self.timeout)
+                    self.sock.connect(self.address)
+                self.sock.sendall(line.encode("utf-8") + b"\n")
+            except OSError as e:
+                logger.warning(f"Alert socket {self.address} unavailable: {e}")
+                self.close_socket()
+
+    def close_socket(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def close(self):
+        with self.lock:
+            self.close_socket()
+
+
+class WebhookSink:
+    # Posts each event from a background thread, so a slow receiver never
+    # holds up the scan.
+    def __init__(self, url, timeout=5.0, max_pending=1000):
+        self.url = url
+        self.name = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self.loop, name="alert-webhook", daemon=True)
+        self.thread.start()
+
+    def send(self, line):
+        try:
+            self.pending.put_nowait(line)
+        except queue.Full:
+            logger.warning(f"Dropping alert for {self.url}: {self.pending.qsize()} events pending.")
+
+    def loop(self):
+        while True:
+            line = self.pending.get()
+            if line is None:
+                break
+            try:
+                response = self.session.post(
+                    self.url, data=line.encode("utf-8"), headers={"Content-Type": "application/json"}, timeout=self.timeout
+                )
+                if not response.ok:
+                    logger.warning(f"Alert webhook {self.url} returned {response.status_code}")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Alert webhook {self.url} failed: {e}")
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join(self.timeout)
+
+
+def make_sink(spec):
+    # stdout | unix:/path/to.sock | tcp:host:port | http(s)://host/path
+    if spec == "stdout":
+        return StdoutSink()
+    if spec.startswith("unix:"):
+        return SocketSink(spec[5:], family=socket.AF_UNIX)
+    if spec.startswith("tcp:"):
+        host, _, port = spec[4:].rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Expected tcp:HOST:PORT, got {spec!r}")
+        return SocketSink((host, int(port)))
+    if spec.startswith(("http://", "https://")):
+        return WebhookSink(spec)
+    raise ValueError(f"Unknown alert sink {spec!r} (use stdout, unix:PATH, tcp:HOST:PORT or an http(s) URL)")
+
+
+def offer_record(offer, arrived):
+    record = offer.to_dict()
+    record["payment_methods"] = list(offer.payment_methods)
+    record["timestamp"] = arrived
+    return record
+
+
+class AlertStream:
+    # Turns book updates into opportunity events the moment a qualifying
+    # pair exists, rather than after the whole scan. A pair is announced
+    # again only when one of its quotes changes.
+    def __init__(self, sinks, board=None, threshold_pct=50.0):
+        if board is None:
+            from Src.daemon import QuoteBoard
+
+            board = QuoteBoard(threshold_pct=threshold_pct)
+        self.board = board
+        self.sinks = list(sinks)
+        self.announced = {}
+        self.sent = 0
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def on_book(self, book):
+        # Expects a book already converted to USD.
+        with self.lock:
+            changed = []
+            for side in SIDES:
+                _, rescored = self.board.update(book.exchange, book.fiat, side, book[side], book.asset, book.timestamp)
+                changed.extend(rescored)
+            self.publish(changed)
+
+    def publish(self, changed):
+        # Takes the keys of rescored pairs, as returned by QuoteBoard.update.
+        for key in changed:
+            trade = self.board.pairs.get(key)
+            if trade is None or trade["profit_pct"] < self.board.threshold_pct:
+                # Gone or below threshold: announce it afresh if it comes back.
+                self.announced.pop(key, None)
+                continue
+            buy, sell = trade["buy"], trade["sell"]
+            signature = (buy.price, buy.merchant, sell.price, sell.merchant)
+            if self.announced.get(key) == signature:
+                self.suppressed += 1
+                continue
+            self.announced[key] = signature
+            self.emit(key, trade)
+
+    def emit(self, key, trade):
+        buy, sell = trade["buy"], trade["sell"]
+        fills = walk(self.board.quotes[key[0]]["offers"], self.board.quotes[key[1]]["offers"], self.board.threshold_pct, trade["fee"])
+        sized = summarize(fills, trade["fee"]) if fills else None
+        now = time.time()
+        # Measured from the newer of the two feeds' latest fetches; cached
+        # offers carry no time of their own.
+        buy_arrived = self.board.quotes[key[0]]["arrived"]
+        sell_arrived = self.board.quotes[key[1]]["arrived"]
+        arrived = max(buy_arrived, sell_arrived)
+        event = {
+            "event": "opportunity",
+            "ts": now,
+            "time_to_alert": round(now - arrived, 6),
+            "profit_pct": round(trade["profit_pct"], 4),
+            "profit_usd": round(trade["profit_usd"], 6),
+            "fillable_usd": round(sized["volume_usd"], 2) if sized else 0.0,
+            "fillable_profit_usd": round(sized["total_profit_usd"], 2) if sized else 0.0,
+            "buy": offer_record(buy, buy_arrived),
+            "sell": offer_record(sell, sell_arrived),
+        }
+        metrics.observe("time_to_alert", now - arrived, exchange=buy.exchange)
+        line = json.dumps(event)
+        for sink in self.sinks:
+            try:
+                sink.send(line)
+            except Exception as e:
+                logger.warning(f"Alert sink {sink.name} failed: {e}")
+        self.sent += 1
+
+    def stats(self):
+        return {"sent": self.sent, "suppressed": self.suppressed}
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def serve_webhook(port, host="127.0.0.1", stream=None):
+    # Local stand-in for a webhook receiver: prints every posted event as a
+    # JSON line.
+    stream = stream or sys.stdout
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            stream.write(body.decode("utf-8") + "\n")
+            stream.flush()
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info(f"Receiving alerts on http://{host}:{server.server_address[1]}/")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in webhook receiver for opportunity alerts")
+    parser.add_argument("--port", type=int, default=9300)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        serve_webhook(args.port).serve_forever()
+    except KeyboardInterrupt:
+        pass
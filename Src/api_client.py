@@ -0,0 +1,132 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from Src.offers import SIDES, DEFAULT_ASSET, OfferBook, payload_digest
+from Src.scraper_base import select_sides
+from Src import metrics
+from Src import response_cache
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+FETCH_MODES = ("auto", "api", "browser")
+# Rough in-memory size of one parsed offer, for the response cache's cap.
+OFFER_BYTES = 200
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0 Safari/537.36",
+    "Accept": "application/json, text/plain, */*",
+}
+
+
+class ApiError(Exception):
+    pass
+
+
+class ApiClient:
+    def __init__(self, name, base_url, pool_size=8, max_retries=2, backoff=0.5, request_timeout=10, headers=None,
+                 cache=None, limiter=None):
+        self.name = name
+        self.cache = cache if cache is not None else response_cache.shared
+        self.limiter = limiter
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.request_timeout = request_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.session.headers.update(headers or {})
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix=f"{name}-http")
+        self.logger = logging.getLogger("ApiClient")
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params)
+
+    def post(self, path, payload):
+        return self.request("POST", path, json=payload)
+
+    def request(self, method, path, **kwargs):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        return self.session.request(method, self.base_url + path, timeout=self.request_timeout, **kwargs)
+
+    def fetch(self, path, params=None, key=None, payload=None):
+        # Returns the decoded body with a digest of the raw bytes, so callers
+        # can tell an unchanged listing without parsing it again. With a key,
+        # identical requests share the response cache and in-flight fetches.
+        # A payload is sent as a JSON POST body instead of a GET.
+        if key is None:
+            return self.load(path, params, payload)[:2]
+        return self.cache.get(key, lambda: self.load(path, params, payload), size=lambda result: result[2])[:2]
+
+    def load(self, path, params=None, payload=None):
+        target = path or self.base_url
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.get(path, params) if payload is None else self.post(path, payload)
+            except requests.exceptions.RequestException as e:
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * (2 ** attempt))
+                    continue
+                raise ApiError(f"{self.name} request to {target} failed: {e}") from e
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * (2 ** attempt)
+                self.logger.warning(f"{self.name} returned {response.status_code} for {target}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if not response.ok:
+                raise ApiError(f"{self.name} returned {response.status_code} for {target}")
+            try:
+                return response.json(), payload_digest(response.content), len(response.content)
+            except ValueError as e:
+                raise ApiError(f"{self.name} returned a non-JSON body for {target}") from e
+        raise ApiError(f"{self.name} gave up on {target} after {self.max_retries + 1} attempts")
+
+    def fetch_offers(self, fetch_side, fiats, sides=SIDES, asset=DEFAULT_ASSET):
+        # One request per (fiat, side), all in flight at once; a fiat only
+        # counts as fetched when every requested side came back.
+        jobs = [(fiat, side) for fiat in fiats for side in sides]
+        futures = {job: self.executor.submit(fetch_side, *job) for job in jobs}
+        offers, failed = {}, []
+        for fiat in fiats:
+            try:
+                books = {side: futures[(fiat, side)].result() for side in sides}
+                offers[fiat] = OfferBook(self.name, fiat, books.get("BUY", ()), books.get("SELL", ()), asset=asset)
+            except Exception as e:
+                self.logger.warning(f"{self.name} API fetch failed for {fiat}: {e}")
+                failed.append(fiat)
+        return offers, failed
+
+
+def offers_with_fallback(scraper, fiats, sides=SIDES):
+    with metrics.span("scrape", exchange=scraper.name):
+        return fetch_with_fallback(scraper, fiats, sides)
+
+
+def browser_offers(scraper, fiats):
+    # Identical browser scrapes running at the same time share one session.
+    key = (scraper.name, scraper.asset, tuple(fiats), "BUY+SELL", "browser")
+    return scraper.api.cache.get(
+        key,
+        lambda: scraper.get_browser_offers(fiats),
+        size=lambda result: sum(len(book) for book in result.values()) * OFFER_BYTES,
+    )
+
+
+def fetch_with_fallback(scraper, fiats, sides=SIDES):
+    # Browser scrapes always cover both sides; unrequested ones are dropped.
+    if scraper.mode == "browser":
+        return select_sides(browser_offers(scraper, fiats), sides)
+    start = time.monotonic()
+    offers, failed = scraper.api.fetch_offers(scraper.fetch_api_side, fiats, sides, scraper.asset)
+    scraper.logger.info(f"Fetched {scraper.name} offers for {len(offers)}/{len(fiats)} fiats over HTTP in {time.monotonic() - start:.2f}s")
+    if failed and scraper.mode == "auto":
+        scraper.logger.warning(f"Falling back to the browser for {', '.join(failed)}")
+        offers.update(select_sides(browser_offers(scraper, failed), sides))
+    for fiat in failed:
+        offers.setdefault(fiat, OfferBook(scraper.name, fiat, asset=scraper.asset))
+    return offers
@@ -0,0 +1,148 @@
+import logging
+import numpy as np
+from Src import metrics
+from Src.offers import CONVERSION_FEE
+
+logger = logging.getLogger("Arbitrage")
+
+SIDE_CODES = {"BUY": 0, "SELL": 1}
+
+
+class OfferTable:
+    def __init__(self, exchanges, fiats, exchange_idx, fiat_idx, side, price, value, source, asset_idx=None):
+        self.exchanges = exchanges
+        self.fiats = fiats
+        self.exchange_idx = exchange_idx
+        self.fiat_idx = fiat_idx
+        self.asset_idx = asset_idx if asset_idx is not None else np.zeros(len(price), dtype=np.int32)
+        self.side = side
+        self.price = price
+        self.value = value
+        self.source = source
+
+    def __len__(self):
+        return len(self.price)
+
+    @classmethod
+    def from_offers(cls, offers):
+        exchanges, fiats, assets = {}, {}, {}
+        n = len(offers)
+        exchange_idx = np.empty(n, dtype=np.int32)
+        fiat_idx = np.empty(n, dtype=np.int32)
+        asset_idx = np.empty(n, dtype=np.int32)
+        side = np.empty(n, dtype=np.int8)
+        price = np.empty(n, dtype=np.float64)
+        # Offers on different assets are compared on value, not usd.
+        value = np.empty(n, dtype=np.float64)
+        source = np.empty(n, dtype=object)
+        for i, offer in enumerate(offers):
+            exchange_idx[i] = exchanges.setdefault(offer.exchange, len(exchanges))
+            fiat_idx[i] = fiats.setdefault(offer.fiat, len(fiats))
+            asset_idx[i] = assets.setdefault(offer.asset, len(assets))
+            side[i] = SIDE_CODES[offer.side]
+            price[i] = offer.price
+            value[i] = offer.value
+            source[i] = offer
+        return cls(list(exchanges), list(fiats), exchange_idx, fiat_idx, side, price, value, source, asset_idx)
+
+    def record(self, i):
+        return self.source[i]
+
+
+class ArbitrageMatcher:
+    def __init__(self, threshold_pct=50.0, top_k=50, allow_same_exchange=False, max_block_cells=4_000_000,
+                 conversion_fee=CONVERSION_FEE):
+        self.threshold_pct = threshold_pct
+        self.conversion_fee = conversion_fee
+        self.top_k = top_k
+        self.allow_same_exchange = allow_same_exchange
+        self.max_block_cells = max_block_cells
+
+    def top_per_exchange(self, table, index, key, k):
+        # Groups are (exchange, asset): whether a pair pays the conversion
+        # fee depends on the asset, so offers on different assets of one
+        # exchange do not rank against each other.
+        group = table.exchange_idx[index].astype(np.int64) * (int(table.asset_idx.max(initial=0)) + 1) + table.asset_idx[index]
+        order = np.lexsort((key, group))
+        group = group[order]
+        group_start = np.r_[0, np.flatnonzero(np.diff(group)) + 1]
+        group_sizes = np.diff(np.r_[group_start, len(order)])
+        rank = np.arange(len(order)) - np.repeat(group_start, group_sizes)
+        return index[order[rank < k]]
+
+    def top_pairs(self, table, min_pct, k):
+        buys = np.flatnonzero((table.side == SIDE_CODES["BUY"]) & (table.value > 0))
+        sells = np.flatnonzero(table.side == SIDE_CODES["SELL"])
+        if len(buys) == 0 or len(sells) == 0 or k <= 0:
+            return []
+
+        # A pair can only be in the top k if its buy is among the k cheapest
+        # of its exchange and asset and its sell among the k richest of its,
+        # so deeper offers never need to enter the spread matrix.
+        buys = self.top_per_exchange(table, buys, table.value[buys], k)
+        sells = self.top_per_exchange(table, sells, -table.value[sells], k)
+
+        # Drop offers that cannot reach the threshold against the best
+        # counterparty before building the spread matrix.
+        factor = 1.0 + min_pct / 100.0
+        buys = buys[table.value[buys] * factor <= table.value[sells].max()]
+        sells = sells[table.value[sells] >= table.value[buys].min() * factor] if len(buys) else sells[:0]
+        if len(buys) == 0 or len(sells) == 0:
+            return []
+
+        sell_value = table.value[sells]
+        sell_exchange = table.exchange_idx[sells]
+        sell_asset = table.asset_idx[sells]
+        keep = 1.0 - self.conversion_fee
+        block = max(1, self.max_block_cells // len(sells))
+        best_pct = np.empty(0, dtype=np.float64)
+        best_buy = np.empty(0, dtype=np.int64)
+        best_sell = np.empty(0, dtype=np.int64)
+
+        for start in range(0, len(buys), block):
+            chunk = buys[start:start + block]
+            buy_value = table.value[chunk][:, None]
+            # Selling a different asset than was bought costs a spot conversion.
+            proceeds = np.where(table.asset_idx[chunk][:, None] == sell_asset[None, :], sell_value[None, :], sell_value[None, :] * keep)
+            pct = (proceeds - buy_value) / buy_value * 100.0
+            if not self.allow_same_exchange:
+                pct[table.exchange_idx[chunk][:, None] == sell_exchange[None, :]] = -np.inf
+            pct[pct < min_pct] = -np.inf
+            if min_pct <= 0:
+                pct[pct <= 0] = -np.inf
+
+            flat = pct.ravel()
+            take = min(k, flat.size)
+            candidates = np.argpartition(flat, flat.size - take)[flat.size - take:]
+            candidates = candidates[np.isfinite(flat[candidates])]
+            rows, cols = np.divmod(candidates, len(sells))
+            best_pct = np.concatenate([best_pct, flat[candidates]])
+            best_buy = np.concatenate([best_buy, chunk[rows]])
+            best_sell = np.concatenate([best_sell, sells[cols]])
+            if len(best_pct) > k:
+                top = np.argpartition(best_pct, len(best_pct) - k)[len(best_pct) - k:]
+                best_pct, best_buy, best_sell = best_pct[top], best_buy[top], best_sell[top]
+
+        order = np.argsort(-best_pct, kind="stable")
+        trades = []
+        for i in order:
+            buy = table.record(best_buy[i])
+            sell = table.record(best_sell[i])
+            fee = self.conversion_fee if buy.asset != sell.asset else 0.0
+            trades.append({
+                "buy": buy,
+                "sell": sell,
+                "profit_pct": float(best_pct[i]),
+                "profit_usd": sell.value * (1.0 - fee) - buy.value,
+                "fee": fee,
+            })
+        return trades
+
+    def match(self, offers):
+        with metrics.span("match"):
+            table = offers if isinstance(offers, OfferTable) else OfferTable.from_offers(offers)
+            profitable_trades = self.top_pairs(table, self.threshold_pct, self.top_k)
+            best = self.top_pairs(table, 0.0, 1)
+        best_trade = best[0] if best else None
+        logger.info(f"Matched {len(table)} offers: {len(profitable_trades)} pairs at or above {self.threshold_pct}%.")
+        return profitable_trades, best_trade
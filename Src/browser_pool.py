@@ -0,0 +1,160 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from Src import metrics
+
+logger = logging.getLogger("BrowserPool")
+
+
+def chrome_factory(headless=True):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--start-maximized")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--log-level=3")
+    return webdriver.Chrome(options=chrome_options)
+
+
+def uc_factory(headless=True):
+    import sys
+    import setuptools._distutils as distutils
+    sys.modules["distutils"] = distutils
+    import undetected_chromedriver as uc
+
+    return uc.Chrome(headless=headless)
+
+
+class BrowserPool:
+    def __init__(self, name, factory, max_browsers=2, max_uses=20, headless=True, acquire_timeout=600):
+        self.name = name
+        self.factory = factory
+        self.max_browsers = max_browsers
+        self.max_uses = max_uses
+        self.headless = headless
+        self.acquire_timeout = acquire_timeout
+        self.idle = []
+        self.uses = {}
+        self.live = 0
+        self.launches = 0
+        self.recycled = 0
+        self.condition = threading.Condition()
+
+    def launch(self):
+        start = time.monotonic()
+        driver = self.factory(headless=self.headless)
+        self.launches += 1
+        self.uses[id(driver)] = 0
+        elapsed = time.monotonic() - start
+        metrics.observe("browser_launch", elapsed, pool=self.name)
+        logger.info(f"Launched {self.name} browser in {elapsed:.2f}s ({self.live} live).")
+        return driver
+
+    def is_healthy(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def discard(self, driver):
+        self.uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting {self.name} browser: {e}")
+        with self.condition:
+            self.live -= 1
+            self.recycled += 1
+            self.condition.notify()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self.condition:
+            while not self.idle and self.live >= self.max_browsers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No {self.name} browser available after {self.acquire_timeout}s")
+                self.condition.wait(remaining)
+            if self.idle:
+                driver = self.idle.pop()
+            else:
+                driver = None
+                self.live += 1
+
+        if driver is None:
+            try:
+                return self.launch()
+            except Exception:
+                with self.condition:
+                    self.live -= 1
+                    self.condition.notify()
+                raise
+
+        if not self.is_healthy(driver):
+            logger.warning(f"Idle {self.name} browser failed health check, replacing it.")
+            self.discard(driver)
+            return self.acquire()
+        return driver
+
+    def release(self, driver):
+        self.uses[id(driver)] = self.uses.get(id(driver), 0) + 1
+        if self.uses[id(driver)] >= self.max_uses:
+            logger.info(f"Recycling {self.name} browser after {self.max_uses} uses.")
+            self.discard(driver)
+            return
+        if not self.is_healthy(driver):
+            logger.warning(f"{self.name} browser crashed or hung, recycling it.")
+            self.discard(driver)
+            return
+        with self.condition:
+            self.idle.append(driver)
+            self.condition.notify()
+
+    @contextmanager
+    def lease(self):
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close_all(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for driver in idle:
+            self.discard(driver)
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+POOL_SETTINGS = {
+    "chrome": {"factory": chrome_factory, "max_browsers": 4},
+    "uc": {"factory": uc_factory, "max_browsers": 1},
+}
+
+
+def get_pool(kind="chrome", **overrides):
+    with pools_lock:
+        if kind not in pools:
+            settings = dict(POOL_SETTINGS[kind])
+            settings.update(overrides)
+            pools[kind] = BrowserPool(kind, **settings)
+        return pools[kind]
+
+
+def close_all_pools():
+    with pools_lock:
+        active = list(pools.values())
+    for pool in active:
+        pool.close_all()
+
+
+atexit.register(close_all_pools)
@@ -0,0 +1,307 @@
+import argparse
+import itertools
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from multiprocessing.managers import BaseManager
+from Src import metrics
+from Src.scraper_base import job_budget
+
+logger = logging.getLogger("Cluster")
+
+DEFAULT_PORT = 50000
+AUTHKEY_VAR = "P2P_BROKER_AUTHKEY"
+
+# Queues served by the broker process. Jobs are (job_id, exchange, asset,
+# fiats, expires); results are (kind, node_id, job_id, payload, timings)
+# with kind one of "claimed", "done", "error" or "alive".
+job_queue = queue.Queue()
+result_queue = queue.Queue()
+
+
+def get_jobs():
+    return job_queue
+
+
+def get_results():
+    return result_queue
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+BrokerManager.register("jobs", callable=get_jobs)
+BrokerManager.register("results", callable=get_results)
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(":")
+    return (host or "127.0.0.1", int(port) if port else DEFAULT_PORT)
+
+
+def broker_authkey():
+    # The broker speaks pickle, so the key is all that stands between a peer
+    # and running code on every host; there is deliberately no default.
+    key = os.environ.get(AUTHKEY_VAR)
+    if not key:
+        raise RuntimeError(f"{AUTHKEY_VAR} is not set; export the same secret on the broker, coordinator and every node")
+    return key.encode("utf-8")
+
+
+def serve_broker(address, authkey=None):
+    # Stand-in for a message broker: two shared queues behind a
+    # multiprocessing manager, reachable from any host that can connect.
+    manager = BrokerManager(address=address, authkey=authkey or broker_authkey())
+    logger.info(f"Broker listening on {address[0]}:{address[1]}.")
+    manager.get_server().serve_forever()
+
+
+def start_broker(address, authkey=None):
+    # Same broker in a child process, for running the coordinator and the
+    # broker on one host.
+    manager = BrokerManager(address=address, authkey=authkey or broker_authkey())
+    manager.start()
+    logger.info(f"Started broker on {address[0]}:{address[1]}.")
+    return manager
+
+
+def connect(address, authkey=None, retries=10, delay=1.0):
+    authkey = authkey or broker_authkey()
+    for attempt in range(retries):
+        manager = BrokerManager(address=address, authkey=authkey)
+        try:
+            manager.connect()
+            return manager
+        except (ConnectionError, OSError) as e:
+            if attempt == retries - 1:
+                raise
+            logger.warning(f"Broker at {address[0]}:{address[1]} unavailable ({e}), retrying in {delay:.0f}s.")
+            time.sleep(delay)
+
+
+class Coordinator:
+    # Drop-in for Supervisor.run_jobs across many nodes. Jobs are split into
+    # shards of at most shard_size fiats and put on the broker's queue; any
+    # node takes the next one, so freshness scales with the number of nodes.
+    # A node that stops sending heartbeats has its claimed shards put back on
+    # the queue, and a shard that overruns its budget is handed out again;
+    # whichever copy reports first is used.
+    def __init__(self, address, authkey=None, job_timeout=300, shard_size=2, node_timeout=30, max_attempts=3,
+                 poll_interval=0.5, serve=False):
+        self.address = address
+        self.job_timeout = job_timeout
+        self.shard_size = shard_size
+        self.node_timeout = node_timeout
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        authkey = authkey or broker_authkey()
+        self.broker = start_broker(address, authkey) if serve else None
+        self.manager = connect(address, authkey)
+        self.jobs = self.manager.jobs()
+        self.results = self.manager.results()
+        self.cycle = uuid.uuid4().hex[:8]
+        self.job_ids = itertools.count()
+        self.nodes = {}
+        self.requeued = 0
+        self.duplicates = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def shards(self, jobs):
+        for scraper, fiats in jobs:
+            for start in range(0, len(fiats), self.shard_size):
+                yield scraper, tuple(fiats[start:start + self.shard_size])
+
+    def submit(self, job_id, job, expires):
+        scraper, fiats = job["scraper"], job["fiats"]
+        job["attempts"] += 1
+        job["node"], job["claimed"] = None, None
+        self.jobs.put((job_id, scraper.name, scraper.asset, fiats, expires))
+
+    def run_jobs(self, jobs, deadline=None):
+        # Yields (scraper, fiats, result) as shards come back.
+        cycle_end = time.monotonic() + deadline if deadline is not None else None
+        expires = time.time() + deadline if deadline is not None else None
+        pending = {}
+        for scraper, fiats in self.shards(jobs):
+            job_id = f"{self.cycle}-{next(self.job_ids)}"
+            pending[job_id] = {"scraper": scraper, "fiats": fiats, "attempts": 0}
+            self.submit(job_id, pending[job_id], expires)
+        logger.info(f"Queued {len(pending)} shards for {len(self.live_nodes())} live nodes.")
+
+        while pending:
+            now = time.monotonic()
+            if cycle_end is not None and now >= cycle_end:
+                logger.warning(f"Scan deadline reached with {len(pending)} shards outstanding, scoring what arrived.")
+                return
+            timeout = self.poll_interval if cycle_end is None else min(self.poll_interval, cycle_end - now)
+            try:
+                kind, node_id, job_id, payload, timings = self.results.get(timeout=timeout)
+            except queue.Empty:
+                kind = None
+            if kind is not None:
+                self.nodes[node_id] = time.monotonic()
+                if timings:
+                    metrics.registry.merge(timings)
+                job = pending.get(job_id)
+                if kind == "claimed" and job is not None:
+                    job["node"], job["claimed"] = node_id, time.monotonic()
+                elif kind in ("done", "error"):
+                    if job is None:
+                        if job_id and job_id.startswith(self.cycle):
+                            self.duplicates += 1
+                    elif kind == "done":
+                        del pending[job_id]
+                        yield job["scraper"], job["fiats"], payload
+                    else:
+                        del pending[job_id]
+                        logger.error(f"Shard {job['scraper'].name}/{','.join(job['fiats'])} failed on {node_id}: {payload}")
+            self.rebalance(pending, expires)
+
+    def live_nodes(self):
+        now = time.monotonic()
+        return [node for node, seen in self.nodes.items() if now - seen <= self.node_timeout]
+
+    def rebalance(self, pending, expires):
+        now = time.monotonic()
+        for job_id, job in list(pending.items()):
+            if job["node"] is None:
+                continue
+            lost = now - self.nodes.get(job["node"], 0.0) > self.node_timeout
+            overdue = now - job["claimed"] > job_budget(self.job_timeout, job["fiats"])
+            if not lost and not overdue:
+                continue
+            name = f"{job['scraper'].name}/{','.join(job['fiats'])}"
+            reason = f"node {job['node']} stopped responding" if lost else f"node {job['node']} overran its budget"
+            if job["attempts"] >= self.max_attempts:
+                logger.error(f"Giving up on shard {name} after {job['attempts']} attempts ({reason}).")
+                del pending[job_id]
+                continue
+            logger.warning(f"Requeueing shard {name}: {reason}.")
+            self.requeued += 1
+            self.submit(job_id, job, expires)
+
+    def stats(self):
+        return {"nodes": len(self.live_nodes()), "requeued": self.requeued, "duplicates": self.duplicates}
+
+    def close(self):
+        logger.info(f"Coordinator stopped: {self.stats()}")
+        if self.broker is not None:
+            self.broker.shutdown()
+
+
+class Node:
+    # Worker node: pulls shards from the broker and sends back offer books.
+    # Each exchange is built once per node and shared by its slots, within
+    # the exchange's own concurrency limit.
+    def __init__(self, address, authkey=None, backend="auto", slots=4, heartbeat=5.0, node_id=None, scraper_kwargs=None):
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.backend = backend
+        self.scraper_kwargs = scraper_kwargs or {}
+        self.slots = slots
+        self.heartbeat = heartbeat
+        self.manager = connect(address, authkey)
+        self.jobs = self.manager.jobs()
+        self.results = self.manager.results()
+        self.scrapers = {}
+        self.limits = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.completed = 0
+
+    def scraper(self, name, asset):
+        from Src import registry
+
+        with self.lock:
+            if name not in self.scrapers:
+                scraper = registry.create(name, self.backend, **self.scraper_kwargs.get(name, {}))
+                self.scrapers[name] = scraper
+                self.limits[name] = threading.Semaphore(max(1, scraper.capabilities(self.backend)["max_concurrency"] or 1))
+            return self.scrapers[name].for_asset(asset), self.limits[name]
+
+    def send(self, kind, job_id=None, payload=None, timings=None):
+        self.results.put((kind, self.node_id, job_id, payload, timings))
+
+    def work(self):
+        while not self.stop_event.is_set():
+            try:
+                job_id, name, asset, fiats, expires = self.jobs.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError) as e:
+                self.lost_broker(e)
+                return
+            if expires is not None and time.time() > expires:
+                continue
+            self.send("claimed", job_id)
+            try:
+                scraper, limit = self.scraper(name, asset)
+                with limit, metrics.span("job", exchange=name):
+                    result = scraper.get_offers_many(list(fiats))
+                kind, payload = "done", result
+                self.completed += 1
+            except Exception as e:
+                kind, payload = "error", f"{type(e).__name__}: {e}"
+            try:
+                self.send(kind, job_id, payload, metrics.registry.drain())
+            except (EOFError, OSError) as e:
+                self.lost_broker(e)
+                return
+
+    def run(self):
+        logger.info(f"Node {self.node_id} working with {self.slots} slots.")
+        threads = [threading.Thread(target=self.work, name=f"node-slot-{i}", daemon=True) for i in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self.stop_event.wait(self.heartbeat):
+                self.send("alive")
+        except (EOFError, OSError) as e:
+            self.lost_broker(e)
+        except KeyboardInterrupt:
+            self.stop_event.set()
+        for thread in threads:
+            thread.join()
+        # Same as the supervisor's workers: browsers are closed explicitly.
+        from Src.browser_pool import close_all_pools
+
+        close_all_pools()
+        logger.info(f"Node {self.node_id} stopped after {self.completed} shards.")
+
+    def lost_broker(self, error):
+        if not self.stop_event.is_set():
+            logger.error(f"Lost connection to the broker ({error!r}), stopping node {self.node_id}.")
+        self.stop_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in broker and worker nodes for sharded scans")
+    parser.add_argument("role", choices=["broker", "node"])
+    parser.add_argument("--address", type=parse_address, default=("127.0.0.1", DEFAULT_PORT), help="broker HOST:PORT")
+    parser.add_argument("--backend", choices=["auto", "api", "browser"], default="auto")
+    parser.add_argument("--slots", type=int, default=4, help="shards a node works on at once")
+    args = parser.parse_args()
+    try:
+        broker_authkey()
+    except RuntimeError as e:
+        parser.error(str(e))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.role == "broker":
+        try:
+            serve_broker(args.address)
+        except KeyboardInterrupt:
+            pass
+    else:
+        Node(args.address, backend=args.backend, slots=args.slots).run()
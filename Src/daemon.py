@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from Src.fiat_prices import get_exchange_rate
+from Src.offers import SIDES, DEFAULT_ASSET, CONVERSION_FEE, diff_offers
+from Src.depth import walk, summarize
+from Src.routes import RouteGraph, describe
+from Src.scheduler import AdaptiveScheduler
+from Src.scraper_base import job_budget
+from Src import response_cache
+
+logger = logging.getLogger("Daemon")
+
+class QuoteBoard:
+    def __init__(self, threshold_pct=50.0, allow_same_exchange=False, conversion_fee=CONVERSION_FEE):
+        self.threshold_pct = threshold_pct
+        self.allow_same_exchange = allow_same_exchange
+        self.conversion_fee = conversion_fee
+        self.quotes = {}
+        self.best = {}
+        self.snapshots = {}
+        self.pairs = {}
+        self.stats = {"unchanged": 0, "changed": 0, "rescored": 0}
+
+    def update(self, exchange, fiat, side, offers, asset=DEFAULT_ASSET, arrived=None):
+        # Returns the per-offer diff against the previous refresh and the
+        # pairs that had to be rescored. arrived is when the fetch behind
+        # offers landed (its book's timestamp), kept per feed.
+        feed = (exchange, fiat, side, asset)
+        previous = self.quotes.get(feed)
+        arrived = time.time() if arrived is None else arrived
+        diff = diff_offers(previous["offers"] if previous else (), offers)
+        if previous is not None and not diff:
+            self.stats["unchanged"] += 1
+            previous["offers"] = offers
+            previous["arrived"] = arrived
+        else:
+            self.stats["changed"] += 1
+            self.quotes[feed] = {"offers": offers, "updated": time.time(), "arrived": arrived}
+
+        # Books keep each side best-first, so the head is the best quote.
+        # Pairs are scored on best quotes only, so changes deeper in the book
+        # (or a quiet feed) leave every pair as it was.
+        # Unchanged feeds hand back the same cached Offer objects with usd
+        # rewritten in place, so the previous best is compared as a snapshot
+        # taken when it was stored; an FX move alone still rescores.
+        best = offers[0] if offers else None
+        snapshot = (best.price, best.merchant, best.usd, best.value) if best is not None else None
+        old = self.snapshots.get(feed)
+        if best is None:
+            self.best.pop(feed, None)
+            self.snapshots.pop(feed, None)
+        else:
+            self.best[feed] = best
+            self.snapshots[feed] = snapshot
+        if snapshot == old:
+            return diff, []
+        self.stats["rescored"] += 1
+        return diff, self.rescore(feed)
+
+    def score(self, buy_feed, sell_feed):
+        buy = self.best.get(buy_feed)
+        sell = self.best.get(sell_feed)
+        if buy is None or sell is None or buy.value <= 0:
+            return None
+        # Scored like the one-shot report: selling another asset than was
+        # bought costs a spot conversion.
+        fee = self.conversion_fee if buy.asset != sell.asset else 0.0
+        profit = sell.value * (1.0 - fee) - buy.value
+        if profit <= 0:
+            return None
+        return {
+            "buy": buy,
+            "sell": sell,
+            "profit_pct": (profit / buy.value) * 100,
+            "profit_usd": profit,
+            "fee": fee,
+        }
+
+    def rescore(self, feed):
+        # Only pairs that include the changed feed can have moved.
+        exchange, _, side, _ = feed
+        other_side = "SELL" if side == "BUY" else "BUY"
+        changed = []
+        for other in list(self.quotes):
+            if other[2] != other_side:
+                continue
+            if other[0] == exchange and not self.allow_same_exchange:
+                continue
+            key = (feed, other) if side == "BUY" else (other, feed)
+            trade = self.score(*key)
+            if trade is None:
+                if self.pairs.pop(key, None) is not None:
+                    changed.append(key)
+                continue
+            self.pairs[key] = trade
+            changed.append(key)
+        return changed
+
+    def opportunities(self):
+        trades = [trade for trade in self.pairs.values() if trade["profit_pct"] >= self.threshold_pct]
+        trades.sort(key=lambda x: x["profit_pct"], reverse=True)
+        return trades
+
+    def best_trade(self):
+        return max(self.pairs.values(), key=lambda x: x["profit_pct"], default=None)
+
+
+class Daemon:
+    def __init__(self, engine, board, fiat_currencies, intervals=None, default_interval=120, max_workers=8, store=None,
+                 scheduler=None, state_path=None, route_limit=5, alerts=None, supervisor=None, job_timeout=300):
+        self.engine = engine
+        # With a supervisor, jobs run in worker processes that are killed,
+        # browsers and all, when they overrun job_timeout; otherwise on
+        # threads, whose overdue jobs are written off.
+        self.supervisor = supervisor
+        self.job_timeout = job_timeout
+        self.alerts = alerts
+        self.board = board
+        self.store = store
+        self.fiat_currencies = fiat_currencies
+        self.max_workers = max_workers
+        self.state_path = state_path
+        self.scheduler = scheduler or AdaptiveScheduler(
+            engine.scrapers,
+            fiat_currencies,
+            base_intervals=intervals,
+            default_interval=default_interval,
+            budget=max_workers / 2,
+            threshold_pct=board.threshold_pct,
+        )
+        if state_path:
+            self.scheduler.load(state_path)
+        self.stop_event = threading.Event()
+        self.routes_dirty = False
+        self.route_keys = set()
+        self.route_limit = route_limit
+
+    def stop(self):
+        self.stop_event.set()
+
+    def apply(self, scraper, result):
+        changed = []
+        stored = []
+        for fiat, book in result.items():
+            if not book:
+                logger.info(f"No offers found for {fiat} on {scraper.name}.")
+            rate = get_exchange_rate(fiat)
+            if rate is None:
+                logger.warning(f"Skipping conversion for {fiat} due to missing exchange rate.")
+                continue
+            book.convert(rate)
+            for side in SIDES:
+                diff, rescored = self.board.update(scraper.name, fiat, side, book[side], book.asset, book.timestamp)
+                changed.extend(rescored)
+                # Only sides that actually changed are written to the store.
+                if diff:
+                    logger.debug(f"{scraper.name} {fiat} {side}: {diff}")
+                    stored.extend(book[side])
+                    self.routes_dirty = True
+        if self.store is not None:
+            self.store.append(stored)
+        return changed
+
+    def report(self, changed):
+        for key in changed:
+            trade = self.board.pairs.get(key)
+            if trade is None or trade["profit_pct"] < self.board.threshold_pct:
+                continue
+            buy, sell = trade["buy"], trade["sell"]
+            fills = walk(self.board.quotes[key[0]]["offers"], self.board.quotes[key[1]]["offers"], self.board.threshold_pct, trade["fee"])
+            sized = summarize(fills, trade["fee"]) if fills else None
+            fillable = (
+                f"fillable {sized['volume_usd']:.2f} USD at +{sized['weighted_profit_pct']:.2f}% (≈{sized['total_profit_usd']:.2f} USD)"
+                if sized else "no fillable size"
+            )
+            logger.info(
+                f"Opportunity {trade['profit_pct']:.2f}%: BUY {buy.exchange} {buy.price} {buy.fiat} "
+                f"({buy.merchant}) -> SELL {sell.exchange} {sell.price} {sell.fiat} ({sell.merchant}), {fillable}"
+            )
+
+    def report_routes(self):
+        # The route graph is rebuilt from every current book whenever a feed
+        # changed; only routes not reported on the previous search are logged.
+        self.routes_dirty = False
+        offers = [offer for quote in self.board.quotes.values() for offer in quote["offers"]]
+        routes = RouteGraph.build(offers).cycles(self.route_limit)
+        keys = set()
+        for route in routes:
+            if route["profit_pct"] < self.board.threshold_pct:
+                continue
+            key = tuple((step["from"], step["to"], step["offer"] and step["offer"].price) for step in route["steps"])
+            keys.add(key)
+            if key not in self.route_keys:
+                logger.info(f"Route {route['profit_pct']:.2f}% over {len(route['steps'])} hops: {describe(route)}")
+        self.route_keys = keys
+
+    def submit(self, executor, scraper, fiats, started):
+        if self.supervisor is not None:
+            return self.supervisor.submit(scraper, fiats)
+        return self.engine.submit(executor, scraper, fiats, started)
+
+    def collect(self, in_flight, started, timeout):
+        # (key, result, error) for every job that finished, failed or ran
+        # out of time.
+        if self.supervisor is not None:
+            return self.supervisor.poll(timeout)
+        outcomes = []
+        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                outcomes.append((future, future.result(), None))
+            except Exception as e:
+                outcomes.append((future, None, e))
+        now = time.monotonic()
+        for future, (scraper, fiats, submitted) in in_flight.items():
+            # Jobs queued behind a hung one on the exchange's semaphore are
+            # timed from submission.
+            job_start = started.get((scraper.name, fiats), submitted)
+            timeout = job_budget(self.job_timeout, fiats)
+            if future not in done and now - job_start > timeout:
+                future.cancel()
+                outcomes.append((future, None, TimeoutError(f"no result after {timeout}s, abandoning the job")))
+        return outcomes
+
+    def run(self, max_refreshes=None):
+        if not self.scheduler.feeds:
+            logger.warning("No scrape jobs to run.")
+            return
+        refreshes = 0
+        started = {}
+        in_flight = {}
+        logger.info(f"Daemon started with {len(self.scheduler.feeds)} feeds.")
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="daemon")
+        try:
+            while not self.stop_event.is_set():
+                for scraper, fiats in self.scheduler.due_jobs(capacity=self.max_workers - len(in_flight)):
+                    self.scheduler.started(scraper, fiats)
+                    key = self.submit(executor, scraper, fiats, started)
+                    in_flight[key] = (scraper, fiats, time.monotonic())
+
+                timeout = min(max(0.0, self.scheduler.next_wakeup() - time.time()), 1.0)
+                if not in_flight:
+                    self.stop_event.wait(timeout)
+                    continue
+                outcomes = self.collect(in_flight, started, timeout)
+                for key, result, error in outcomes:
+                    if key not in in_flight:
+                        continue
+                    scraper, fiats, submitted = in_flight.pop(key)
+                    duration = time.monotonic() - started.pop((scraper.name, fiats), submitted)
+                    try:
+                        if error is not None:
+                            raise error
+                        changed = self.apply(scraper, result)
+                        self.report(changed)
+                        if self.alerts is not None:
+                            self.alerts.publish(changed)
+                    except Exception as e:
+                        result = None
+                        logger.error(f"Refresh of {scraper.name}/{','.join(fiats)} failed: {e}")
+                    # A failed or abandoned job counts as an empty refresh, so
+                    # the feed backs off instead of staying in flight.
+                    self.scheduler.finished(scraper, fiats, result, duration, self.board)
+                    refreshes += 1
+                    if max_refreshes is not None and refreshes >= max_refreshes:
+                        self.stop_event.set()
+                if self.routes_dirty and self.route_limit:
+                    self.report_routes()
+                if outcomes and self.state_path:
+                    self.scheduler.save(self.state_path)
+        finally:
+            # Threads stuck past their timeout must not hold up shutdown.
+            executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Daemon stopped after {refreshes} feed refreshes.")
+        logger.info(f"Feed schedule: {self.scheduler.summary()}")
+        logger.info(f"Feed updates: {self.board.stats}")
+        parse_stats = {scraper.name: scraper.parsed.stats() for scraper in self.engine.scrapers if hasattr(scraper, "parsed")}
+        logger.info(f"Parse cache: {parse_stats}")
+        logger.info(f"Response cache: {response_cache.shared.stats()}")
+        if self.alerts is not None:
+            logger.info(f"Alerts: {self.alerts.stats()}")
@@ -0,0 +1,130 @@
+import logging
+import math
+from Src import metrics
+from Src.arbitrage import ArbitrageMatcher, OfferTable
+from Src.offers import CONVERSION_FEE
+
+logger = logging.getLogger("Depth")
+
+
+def order_window(offer):
+    # Size bounds of one order on this advert, in USDT at the asset's
+    # reference price: (smallest order, largest order, total left). Adverts
+    # with neither a maximum order nor an available quantity cannot be sized
+    # and get no capacity.
+    low = offer.min_amount / offer.price * offer.spot if offer.min_amount else 0.0
+    high = offer.max_amount / offer.price * offer.spot if offer.max_amount else math.inf
+    capacity = offer.available * offer.spot if offer.available is not None else high
+    if math.isinf(capacity):
+        capacity = 0.0
+    return low, min(high, capacity), capacity
+
+
+def walk(asks, bids, min_pct=0.0, fee=0.0):
+    # Fills the cheapest asks against the richest bids for as long as each
+    # fill clears min_pct net of fee. A fill has to fit both adverts' order
+    # windows, so a bid whose minimum is above what an ask can give is passed
+    # over for that ask but stays available to the next one.
+    factor = (1.0 + min_pct / 100.0) / (1.0 - fee)
+    open_bids = []
+    for bid in bids:
+        low, high, capacity = order_window(bid)
+        if capacity > 0:
+            open_bids.append([bid, low, high, capacity])
+    fills = []
+    for ask in asks:
+        if not open_bids or open_bids[0][0].value < ask.value * factor:
+            break
+        ask_low, ask_high, ask_left = order_window(ask)
+        for entry in open_bids:
+            bid, bid_low, bid_high, bid_left = entry
+            if bid.value < ask.value * factor or ask_left < ask_low or ask_left <= 0:
+                break
+            while True:
+                quantity = min(ask_high, ask_left, bid_high, bid_left)
+                if quantity <= 0 or quantity < ask_low or quantity < bid_low:
+                    break
+                fills.append((ask, bid, quantity))
+                ask_left -= quantity
+                bid_left -= quantity
+            entry[3] = bid_left
+        open_bids = [entry for entry in open_bids if entry[3] > 0 and entry[3] >= entry[1]]
+    return fills
+
+
+def summarize(fills, fee=0.0):
+    # Quantities are USDT at reference prices; values are USD per USDT.
+    keep = 1.0 - fee
+    quantity = sum(q for _, _, q in fills)
+    volume = sum(q * ask.value for ask, _, q in fills)
+    profit = sum(q * (bid.value * keep - ask.value) for ask, bid, q in fills)
+    buy, sell, _ = fills[0]
+    return {
+        "buy": buy,
+        "sell": sell,
+        "profit_pct": (sell.value * keep - buy.value) / buy.value * 100.0,
+        "profit_usd": sell.value * keep - buy.value,
+        "quantity": quantity,
+        "volume_usd": volume,
+        "total_profit_usd": profit,
+        "weighted_profit_pct": profit / volume * 100.0 if volume else 0.0,
+        "orders": len(fills),
+        "fills": fills,
+    }
+
+
+def group_books(offers):
+    books = {}
+    for offer in offers:
+        if offer.usd is not None and offer.usd > 0:
+            books.setdefault((offer.exchange, offer.asset, offer.fiat, offer.side), []).append(offer)
+    for (_, _, _, side), book in books.items():
+        book.sort(key=lambda offer: offer.value, reverse=side == "SELL")
+    return books
+
+
+def feed_of(offer):
+    return offer.exchange, offer.asset, offer.fiat, offer.side
+
+
+def unsized(trade):
+    # A pair that clears the threshold at the top of book but cannot be
+    # walked, usually because neither advert lists a maximum order or an
+    # available quantity (e.g. browser rows whose limits did not parse).
+    return dict(trade, quantity=None, volume_usd=None, total_profit_usd=None, weighted_profit_pct=None, orders=0, fills=[])
+
+
+class DepthMatcher:
+    # Thresholding and the best pair come from the vectorized
+    # ArbitrageMatcher run over the head of every feed: books are kept
+    # best-first, so two heads are the best offer pair of their feeds and
+    # each candidate is a distinct feed pair. Only the top-K of those are
+    # walked through book depth. Pairs may cross assets: bought in one asset
+    # and sold in another after a spot conversion.
+    def __init__(self, threshold_pct=50.0, top_k=50, allow_same_exchange=False, conversion_fee=CONVERSION_FEE):
+        self.threshold_pct = threshold_pct
+        self.top_k = top_k
+        self.allow_same_exchange = allow_same_exchange
+        self.conversion_fee = conversion_fee
+        self.matcher = ArbitrageMatcher(threshold_pct, top_k, allow_same_exchange, conversion_fee=conversion_fee)
+
+    def size(self, books, candidates):
+        sized, unknown = [], []
+        for trade in candidates:
+            fills = walk(books[feed_of(trade["buy"])], books[feed_of(trade["sell"])], self.threshold_pct, trade["fee"])
+            if fills:
+                sized.append(summarize(fills, trade["fee"]))
+            else:
+                unknown.append(unsized(trade))
+        sized.sort(key=lambda trade: trade["total_profit_usd"], reverse=True)
+        return sized + unknown
+
+    def match(self, offers):
+        with metrics.span("depth"):
+            books = group_books(offers)
+            heads = [book[0] for book in books.values()]
+            candidates, best = self.matcher.match(OfferTable.from_offers(heads))
+            trades = self.size(books, candidates) if candidates else []
+        sized = sum(1 for trade in trades if trade["orders"])
+        logger.info(f"Sized {sized} of {len(trades)} pairs at or above {self.threshold_pct}%.")
+        return trades[:self.top_k], best
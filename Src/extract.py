@@ -0,0 +1,67 @@
+import re
+import logging
+from Src import metrics
+
+logger = logging.getLogger("Extract")
+
+# Evaluates every field XPath in the page and returns one plain record per
+# offer row, so a whole page costs a single WebDriver round-trip. price and
+# merchant are page-wide XPaths; limits and payment are relative (".//")
+# and evaluated inside each price's row.
+EXTRACT_SCRIPT = """
+const spec = arguments[0];
+function all(xpath, context) {
+    const result = document.evaluate(xpath, context || document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+    return nodes;
+}
+function text(node) {
+    return node ? (node.innerText || node.textContent || '').trim() : '';
+}
+const prices = all(spec.price);
+const merchants = spec.merchant ? all(spec.merchant) : [];
+function rowOf(node) {
+    let row = node;
+    while (row.parentElement && row.parentElement !== document.body) {
+        const parent = row.parentElement;
+        if (prices.filter(p => parent.contains(p)).length > 1) break;
+        row = parent;
+    }
+    return row;
+}
+return prices.map(function (price, i) {
+    const row = rowOf(price);
+    const limits = spec.limits ? all(spec.limits, row) : [];
+    return {
+        price: text(price),
+        merchant: i < merchants.length ? text(merchants[i]) : null,
+        row_text: text(row),
+        limits_text: limits.length ? text(limits[0]) : null,
+        payment_methods: spec.payment ? all(spec.payment, row).map(text).filter(Boolean) : []
+    };
+});
+"""
+
+LIMITS_PATTERN = re.compile(r"([\d][\d,]*(?:\.\d+)?)\s*[-–~]\s*([\d][\d,]*(?:\.\d+)?)")
+
+
+def parse_limits(text):
+    if not text:
+        return None, None
+    match = LIMITS_PATTERN.search(text)
+    if not match:
+        return None, None
+    try:
+        return float(match.group(1).replace(",", "")), float(match.group(2).replace(",", ""))
+    except ValueError:
+        return None, None
+
+
+def extract_rows(driver, spec, site=None):
+    with metrics.span("extract", exchange=site):
+        rows = driver.execute_script(EXTRACT_SCRIPT, spec) or []
+    for row in rows:
+        row["min_amount"], row["max_amount"] = parse_limits(row.get("limits_text") or row.get("row_text"))
+    logger.debug(f"Extracted {len(rows)} rows in one call for {spec['price']}")
+    return rows
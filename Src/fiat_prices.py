@@ -1,21 +1,118 @@
 import requests
 import logging
+import threading
+import time
+from Src import metrics
 
 logger = logging.getLogger("FiatPrices")
 
-def get_exchange_rate(fiat):
-    fiat = fiat.upper()
-    if fiat == "USD":
-        return 1.0
-    url = "https://open.er-api.com/v6/latest/USD"
-    try:
-        response = requests.get(url)
+FX_RATES_URL = "https://open.er-api.com/v6/latest/USD"
+
+
+class FXRateProvider:
+    def __init__(self, url=FX_RATES_URL, ttl=600, refresh_ahead=60, max_stale=86400, request_timeout=10):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+        self.request_timeout = request_timeout
+        self.rates = None
+        self.fetched_at = None
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.stale_hits = 0
+        self.lock = threading.Lock()
+        self.refreshing = False
+
+    def fetch_rates(self):
+        response = requests.get(self.url, timeout=self.request_timeout)
         response.raise_for_status()
         data = response.json()
-        rate = data.get("rates", {}).get(fiat)
+        rates = data.get("rates")
+        if not rates:
+            raise ValueError("FX response did not contain a rates table")
+        return rates
+
+    def load(self):
+        self.fetches += 1
+        try:
+            rates = self.fetch_rates()
+        except Exception as e:
+            self.fetch_errors += 1
+            logger.error(f"Error fetching exchange rates: {e}")
+            return None
+        logger.info(f"Loaded {len(rates)} exchange rates.")
+        return rates
+
+    def store(self, rates):
+        self.rates = rates
+        self.fetched_at = time.monotonic()
+
+    def refresh(self):
+        rates = self.load()
+        if rates is None:
+            return False
+        with self.lock:
+            self.store(rates)
+        return True
+
+    def background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def get_rates(self):
+        with self.lock:
+            age = time.monotonic() - self.fetched_at if self.fetched_at is not None else None
+            if age is not None and age < self.ttl:
+                self.hits += 1
+                if age >= self.ttl - self.refresh_ahead and not self.refreshing:
+                    self.refreshing = True
+                    threading.Thread(target=self.background_refresh, name="fx-refresh", daemon=True).start()
+                return self.rates
+            self.misses += 1
+            # Expired or empty: fetch synchronously while holding the lock so
+            # concurrent callers wait for one request instead of firing their own.
+            rates = self.load()
+            if rates is not None:
+                self.store(rates)
+                return rates
+            if age is not None and age < self.max_stale:
+                self.stale_hits += 1
+                logger.warning(f"Serving stale exchange rates ({age:.0f}s old).")
+                return self.rates
+            return None
+
+    def get_exchange_rate(self, fiat):
+        fiat = fiat.upper()
+        if fiat == "USD":
+            return 1.0
+        with metrics.span("fx_lookup", fiat=fiat):
+            rates = self.get_rates()
+        if rates is None:
+            logger.error(f"No exchange rates available for {fiat}")
+            return None
+        rate = rates.get(fiat)
         if rate is None:
             logger.warning(f"No exchange rate found for {fiat}")
         return rate
-    except Exception as e:
-        logger.error(f"Error fetching exchange rate for {fiat}: {e}")
-        return None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "stale_hits": self.stale_hits,
+        }
+
+
+default_provider = FXRateProvider()
+
+
+def get_exchange_rate(fiat):
+    return default_provider.get_exchange_rate(fiat)
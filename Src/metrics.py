@@ -0,0 +1,189 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("Metrics")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_NAME = "p2p_stage_seconds"
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}
+        self.server = None
+        self.dump_thread = None
+        self.dump_stop = threading.Event()
+
+    def observe(self, stage, seconds, **labels):
+        key = (stage,) + tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            entry = self.series.get(key)
+            if entry is None:
+                entry = self.series[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+            entry["buckets"][index] += 1
+            entry["sum"] += seconds
+            entry["count"] += 1
+            entry["max"] = max(entry["max"], seconds)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def drain(self):
+        # Hands over everything recorded so far and starts afresh; worker
+        # processes ship these deltas to the parent with each result.
+        with self.lock:
+            series, self.series = self.series, {}
+        return series
+
+    def merge(self, series):
+        with self.lock:
+            for key, incoming in series.items():
+                entry = self.series.get(key)
+                if entry is None:
+                    self.series[key] = {
+                        "buckets": list(incoming["buckets"]),
+                        "sum": incoming["sum"],
+                        "count": incoming["count"],
+                        "max": incoming["max"],
+                    }
+                    continue
+                entry["buckets"] = [a + b for a, b in zip(entry["buckets"], incoming["buckets"])]
+                entry["sum"] += incoming["sum"]
+                entry["count"] += incoming["count"]
+                entry["max"] = max(entry["max"], incoming["max"])
+
+    def quantile(self, entry, q):
+        target = q * entry["count"]
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), entry["buckets"]):
+            seen += count
+            if seen >= target:
+                return min(bound, entry["max"])
+        return entry["max"]
+
+    def snapshot(self):
+        with self.lock:
+            items = [(key, dict(entry, buckets=list(entry["buckets"]))) for key, entry in self.series.items()]
+        return [
+            {
+                "stage": key[0],
+                "labels": dict(key[1:]),
+                "count": entry["count"],
+                "sum": round(entry["sum"], 6),
+                "avg": round(entry["sum"] / entry["count"], 6),
+                "p50": round(self.quantile(entry, 0.5), 6),
+                "p95": round(self.quantile(entry, 0.95), 6),
+                "max": round(entry["max"], 6),
+            }
+            for key, entry in sorted(items)
+        ]
+
+    def summary(self, by="stage", stage=None):
+        # Stages nest (a job contains its fetches), so per-label totals are
+        # only meaningful for a single stage.
+        totals = {}
+        for row in self.snapshot():
+            if stage is not None and row["stage"] != stage:
+                continue
+            name = row["stage"] if by == "stage" else row["labels"].get(by, "-")
+            totals[name] = round(totals.get(name, 0.0) + row["sum"], 3)
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+    def to_prometheus(self):
+        with self.lock:
+            items = sorted((key, dict(entry, buckets=list(entry["buckets"]))) for key, entry in self.series.items())
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent per scrape pipeline stage.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for key, entry in items:
+            labels = [("stage", key[0])] + list(key[1:])
+            base = ",".join(f'{name}="{value}"' for name, value in labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{METRIC_NAME}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{METRIC_NAME}_sum{{{base}}} {entry['sum']:.6f}")
+            lines.append(f"{METRIC_NAME}_count{{{base}}} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"generated": time.time(), "stages": self.snapshot()}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_dump(self, path, interval=60):
+        def loop():
+            while not self.dump_stop.wait(interval):
+                try:
+                    self.dump(path)
+                except OSError as e:
+                    logger.warning(f"Could not write metrics to {path}: {e}")
+
+        self.dump_thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        self.dump_thread.start()
+
+    def serve(self, port, host="127.0.0.1"):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, content_type = json.dumps(registry.snapshot()).encode("utf-8"), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, content_type = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def stop(self):
+        self.dump_stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+registry = MetricsRegistry()
+
+
+def span(stage, **labels):
+    return registry.span(stage, **labels)
+
+
+def observe(stage, seconds, **labels):
+    registry.observe(stage, seconds, **labels)
@@ -0,0 +1,235 @@
+import hashlib
+import threading
+import time
+
+SIDES = ("BUY", "SELL")
+# Quotes are priced in USDT; other assets are compared through their USDT
+# reference price.
+DEFAULT_ASSET = "USDT"
+# Spot trading fee paid converting one asset into another, charged on pairs
+# that buy one asset and sell a different one.
+CONVERSION_FEE = 0.001
+
+
+class Offer:
+    # One advert. Slots keep a full order book cheap to hold and to ship
+    # back from worker processes; usd (per unit of the asset) and spot (the
+    # asset's USDT reference price) are filled in at conversion time.
+    # min_amount/max_amount bound a single order in fiat, available is the
+    # advert's remaining quantity of the asset.
+    __slots__ = ("price", "merchant", "side", "fiat", "exchange", "min_amount", "max_amount", "available",
+                 "payment_methods", "timestamp", "usd", "asset", "spot")
+
+    def __init__(self, price, merchant, side, fiat, exchange, min_amount=None, max_amount=None, available=None,
+                 payment_methods=(), timestamp=None, usd=None, asset=DEFAULT_ASSET, spot=1.0):
+        self.price = price
+        self.merchant = merchant
+        self.side = side
+        self.fiat = fiat
+        self.exchange = exchange
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.available = available
+        self.payment_methods = payment_methods
+        self.timestamp = timestamp
+        self.usd = usd
+        self.asset = asset
+        self.spot = spot
+
+    @property
+    def value(self):
+        # USD per USDT's worth of the asset, so offers on different assets
+        # compare directly. Equal to usd for USDT.
+        return self.usd / self.spot if self.usd is not None else None
+
+    def __repr__(self):
+        return f"Offer({self.exchange} {self.asset}/{self.fiat} {self.side} {self.price} {self.merchant!r})"
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def to_amount(value):
+    # Order-size limits arrive as strings, numbers or blanks; unknown is None.
+    try:
+        amount = float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+    return amount if amount > 0 else None
+
+
+# Exchanges spell the same payment rail differently.
+METHOD_ALIASES = {
+    "bank": "bank_transfer",
+    "banktransfer": "bank_transfer",
+    "bank_transfer": "bank_transfer",
+    "local_bank_transfer": "bank_transfer",
+    "domestic_wire_transfer": "bank_transfer",
+    "sepa_instant": "sepa",
+    "wise": "wise",
+    "transferwise": "wise",
+    "mpesa": "m_pesa",
+    "m_pesa": "m_pesa",
+    "pix": "pix",
+}
+
+
+def payment_methods(values):
+    if not values:
+        return ()
+    if isinstance(values, str):
+        values = [values]
+    methods = []
+    for value in values:
+        if not value:
+            continue
+        key = "_".join(str(value).lower().replace("-", " ").split())
+        method = METHOD_ALIASES.get(key, key)
+        if method not in methods:
+            methods.append(method)
+    return tuple(methods)
+
+
+def price_key(offer):
+    return offer.price
+
+
+def reverse_price_key(offer):
+    return -offer.price
+
+
+class OfferBook:
+    # All offers for one exchange, asset and fiat. Each side is kept
+    # best-first (cheapest BUY, richest SELL), so the top of book is an
+    # index lookup. timestamp is when this fetch arrived; it is not copied
+    # onto the offers, which the parse cache hands back on later fetches.
+    __slots__ = ("exchange", "fiat", "timestamp", "sides", "asset")
+
+    def __init__(self, exchange, fiat, buys=(), sells=(), timestamp=None, asset=DEFAULT_ASSET):
+        self.exchange = exchange
+        self.fiat = fiat
+        self.asset = asset
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.sides = {"BUY": sorted(buys, key=price_key), "SELL": sorted(sells, key=reverse_price_key)}
+        for offer in self:
+            offer.asset = asset
+
+    def __getitem__(self, side):
+        return self.sides[side]
+
+    def __len__(self):
+        return len(self.sides["BUY"]) + len(self.sides["SELL"])
+
+    def __iter__(self):
+        yield from self.sides["BUY"]
+        yield from self.sides["SELL"]
+
+    def __repr__(self):
+        return f"OfferBook({self.exchange} {self.asset}/{self.fiat}: {len(self.sides['BUY'])} buy, {len(self.sides['SELL'])} sell)"
+
+    def best(self, side):
+        offers = self.sides[side]
+        return offers[0] if offers else None
+
+    @property
+    def best_ask(self):
+        # Cheapest advert a user can buy from.
+        return self.best("BUY")
+
+    @property
+    def best_bid(self):
+        # Richest advert a user can sell to.
+        return self.best("SELL")
+
+    def convert(self, rate, spot=1.0):
+        for offer in self:
+            offer.usd = offer.price / rate
+            offer.spot = spot
+        return self
+
+
+def best_prices(book):
+    buy, sell = book.best_ask, book.best_bid
+    return (
+        buy.price if buy else None,
+        sell.price if sell else None,
+        buy.merchant if buy else "Unknown",
+        sell.merchant if sell else "Unknown",
+    )
+
+
+def payload_digest(payload):
+    # Raw HTTP bodies are hashed as they arrived; decoded page rows by repr.
+    if not isinstance(payload, bytes):
+        payload = repr(payload).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class ParseCache:
+    # Remembers each feed's last payload digest and the offers parsed from
+    # it, so a page that has not changed since the last poll is not parsed
+    # again and hands back the very same Offer objects.
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, key, digest, parse, *args):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == digest:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        offers = parse(*args)
+        with self.lock:
+            self.entries[key] = (digest, offers)
+        return offers
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "feeds": len(self.entries)}
+
+
+class OfferDiff:
+    __slots__ = ("added", "removed", "repriced")
+
+    def __init__(self, added=(), removed=(), repriced=()):
+        self.added = added
+        self.removed = removed
+        # (old, new) pairs for adverts that stayed up at a new price.
+        self.repriced = repriced
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.repriced)
+
+    def __repr__(self):
+        return f"OfferDiff(+{len(self.added)} -{len(self.removed)} ~{len(self.repriced)})"
+
+
+def offer_key(offer):
+    return offer.merchant, offer.min_amount, offer.max_amount
+
+
+def diff_offers(old, new):
+    # Offers reused from the parse cache compare by identity, so a quiet
+    # feed costs one pointer check per offer.
+    if len(old) == len(new) and all(a is b for a, b in zip(old, new)):
+        return OfferDiff()
+    # Adverts are matched on merchant and order limits; a merchant with
+    # several identical adverts has them matched best-first.
+    previous = {}
+    for offer in old:
+        previous.setdefault(offer_key(offer), []).append(offer)
+    added, repriced = [], []
+    for offer in new:
+        matches = previous.get(offer_key(offer))
+        if not matches:
+            added.append(offer)
+            continue
+        before = matches.pop(0)
+        if before.price != offer.price:
+            repriced.append((before, offer))
+    removed = [offer for matches in previous.values() for offer in matches]
+    return OfferDiff(added, removed, repriced)
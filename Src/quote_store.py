@@ -0,0 +1,204 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+from Src.offers import SIDES, DEFAULT_ASSET, Offer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger("QuoteStore")
+
+QUOTE_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("exchange", "<u2"),
+    ("fiat", "<u2"),
+    ("side", "u1"),
+    ("price", "<f8"),
+    ("usd", "<f8"),
+    ("merchant", "<u4"),
+])
+
+SYMBOL_KINDS = ("exchange", "fiat", "merchant")
+
+QUOTES_PATH = "data/quotes"
+
+
+def asset_path(asset, root=QUOTES_PATH):
+    # USDT quotes stay at the root; other assets get a store of their own.
+    return root if asset == DEFAULT_ASSET else os.path.join(root, asset)
+
+
+@contextmanager
+def file_lock(path):
+    # Advisory lock held across processes, e.g. a cron one-shot and the
+    # daemon writing to the same store.
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class QuoteStore:
+    def __init__(self, path=QUOTES_PATH, asset=DEFAULT_ASSET):
+        self.asset = asset
+        self.path = path = asset_path(asset, path)
+        os.makedirs(path, exist_ok=True)
+        self.lock = threading.Lock()
+        self.symbols_path = os.path.join(path, "symbols.json")
+        self.lock_path = os.path.join(path, ".lock")
+        self.symbols_seen = None
+        self.symbols = {kind: [] for kind in SYMBOL_KINDS}
+        self.codes = {kind: {} for kind in SYMBOL_KINDS}
+        self.load_symbols()
+        self.symbols_dirty = False
+
+    def load_symbols(self):
+        # symbols.json is shared with other writers and only ever grows, so
+        # the copy on disk replaces ours whenever it has changed.
+        try:
+            version = self.symbols_version()
+        except FileNotFoundError:
+            return
+        if version == self.symbols_seen:
+            return
+        with open(self.symbols_path, encoding="utf-8") as f:
+            self.symbols = {kind: [] for kind in SYMBOL_KINDS}
+            self.symbols.update(json.load(f))
+        self.codes = {kind: {name: i for i, name in enumerate(names)} for kind, names in self.symbols.items()}
+        self.symbols_seen = version
+
+    def symbols_version(self):
+        # Every save replaces the file, so a new inode means a new table even
+        # where mtimes are coarse.
+        stat = os.stat(self.symbols_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def code(self, kind, name):
+        codes = self.codes[kind]
+        if name not in codes:
+            codes[name] = len(self.symbols[kind])
+            self.symbols[kind].append(name)
+            self.symbols_dirty = True
+        return codes[name]
+
+    def save_symbols(self):
+        tmp_path = self.symbols_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.symbols, f)
+        os.replace(tmp_path, self.symbols_path)
+        self.symbols_seen = self.symbols_version()
+
+    def segment_path(self, day):
+        return os.path.join(self.path, f"{day}.bin")
+
+    def last_ts(self, day):
+        try:
+            with open(self.segment_path(day), "rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size < QUOTE_DTYPE.itemsize:
+                    return 0.0
+                f.seek(size - size % QUOTE_DTYPE.itemsize - QUOTE_DTYPE.itemsize)
+                return float(np.frombuffer(f.read(QUOTE_DTYPE.itemsize), dtype=QUOTE_DTYPE)["ts"][0])
+        except FileNotFoundError:
+            return 0.0
+
+    def append(self, offers, ts=None):
+        if not offers:
+            return 0
+        # Codes are assigned against the latest symbols on disk, under a lock
+        # every process writing to this store takes. The time is taken under
+        # it too, and never behind the segment's last row, so each segment
+        # stays sorted for query() even with several writers.
+        with self.lock, file_lock(self.lock_path):
+            ts = time.time() if ts is None else ts
+            day = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+            ts = max(ts, self.last_ts(day))
+            self.load_symbols()
+            self.symbols_dirty = False
+            rows = np.empty(len(offers), dtype=QUOTE_DTYPE)
+            rows["ts"] = ts
+            rows["exchange"] = [self.code("exchange", offer.exchange) for offer in offers]
+            rows["fiat"] = [self.code("fiat", offer.fiat) for offer in offers]
+            rows["side"] = [SIDES.index(offer.side) for offer in offers]
+            rows["price"] = [offer.price for offer in offers]
+            rows["usd"] = [np.nan if offer.usd is None else offer.usd for offer in offers]
+            rows["merchant"] = [self.code("merchant", offer.merchant) for offer in offers]
+            # Symbols go first so every code on disk can be resolved.
+            if self.symbols_dirty:
+                self.save_symbols()
+            with open(self.segment_path(day), "ab") as f:
+                f.write(rows.tobytes())
+        logger.info(f"Stored {len(rows)} quotes for {day}.")
+        return len(rows)
+
+    def segments(self, start=None, end=None):
+        names = sorted(name for name in os.listdir(self.path) if name.endswith(".bin"))
+        start_day = datetime.fromtimestamp(start, tz=timezone.utc).strftime("%Y-%m-%d") if start is not None else None
+        end_day = datetime.fromtimestamp(end, tz=timezone.utc).strftime("%Y-%m-%d") if end is not None else None
+        for name in names:
+            day = name[:-4]
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            path = os.path.join(self.path, name)
+            count = os.path.getsize(path) // QUOTE_DTYPE.itemsize
+            if count:
+                yield np.memmap(path, dtype=QUOTE_DTYPE, mode="r", shape=(count,))
+
+    def query(self, exchange=None, fiat=None, side=None, start=None, end=None):
+        with self.lock:
+            self.load_symbols()
+        filters = {}
+        for kind, name in (("exchange", exchange), ("fiat", fiat)):
+            if name is not None:
+                if name not in self.codes[kind]:
+                    return np.empty(0, dtype=QUOTE_DTYPE)
+                filters[kind] = self.codes[kind][name]
+        if side is not None:
+            filters["side"] = SIDES.index(side)
+
+        parts = []
+        for segment in self.segments(start, end):
+            # Rows are appended in time order, so the time range is a slice.
+            lo = np.searchsorted(segment["ts"], start, side="left") if start is not None else 0
+            hi = np.searchsorted(segment["ts"], end, side="right") if end is not None else len(segment)
+            window = segment[lo:hi]
+            mask = np.ones(len(window), dtype=bool)
+            for column, value in filters.items():
+                mask &= window[column] == value
+            parts.append(np.array(window[mask]))
+        if not parts:
+            return np.empty(0, dtype=QUOTE_DTYPE)
+        return np.concatenate(parts)
+
+    def to_records(self, rows):
+        return [
+            Offer(
+                float(row["price"]),
+                self.symbols["merchant"][row["merchant"]],
+                SIDES[row["side"]],
+                self.symbols["fiat"][row["fiat"]],
+                self.symbols["exchange"][row["exchange"]],
+                timestamp=float(row["ts"]),
+                usd=float(row["usd"]),
+                asset=self.asset,
+            )
+            for row in rows
+        ]
@@ -0,0 +1,87 @@
+import json
+import logging
+import threading
+import time
+import requests
+from Src import metrics
+
+logger = logging.getLogger("ReferencePrices")
+
+SPOT_PRICES_URL = "https://api.binance.com/api/v3/ticker/price"
+QUOTE_ASSET = "USDT"
+SUPPORTED_ASSETS = ("USDT", "USDC", "BTC", "ETH")
+
+
+class ReferencePriceProvider:
+    # USDT spot price of each scanned asset, loaded with one request per scan
+    # cycle however many assets and feeds there are. USDT is the unit every
+    # quote is measured in, so it is 1.0 and never fetched.
+    def __init__(self, url=SPOT_PRICES_URL, max_stale=3600, request_timeout=10):
+        self.url = url
+        self.max_stale = max_stale
+        self.request_timeout = request_timeout
+        self.prices = {QUOTE_ASSET: 1.0}
+        self.fetched_at = {}
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.lock = threading.Lock()
+
+    def fetch_prices(self, assets):
+        symbols = [f"{asset}{QUOTE_ASSET}" for asset in assets]
+        response = requests.get(self.url, params={"symbols": json.dumps(symbols, separators=(",", ":"))},
+                                timeout=self.request_timeout)
+        response.raise_for_status()
+        prices = {}
+        for ticker in response.json():
+            symbol = ticker.get("symbol", "")
+            if symbol.endswith(QUOTE_ASSET):
+                prices[symbol[:-len(QUOTE_ASSET)]] = float(ticker["price"])
+        return prices
+
+    def refresh(self, assets):
+        wanted = sorted({asset.upper() for asset in assets} - {QUOTE_ASSET})
+        if not wanted:
+            return
+        with metrics.span("reference_prices"), self.lock:
+            self.fetches += 1
+            try:
+                prices = self.fetch_prices(wanted)
+            except Exception as e:
+                self.fetch_errors += 1
+                logger.error(f"Error fetching reference prices for {', '.join(wanted)}: {e}")
+                return
+            now = time.monotonic()
+            for asset, price in prices.items():
+                self.prices[asset] = price
+                self.fetched_at[asset] = now
+        missing = [asset for asset in wanted if asset not in prices]
+        if missing:
+            logger.warning(f"No reference price returned for {', '.join(missing)}")
+        logger.info(f"Loaded reference prices: {', '.join(f'{asset}={prices[asset]:g}' for asset in wanted if asset in prices)}")
+
+    def get_price(self, asset):
+        asset = asset.upper()
+        with self.lock:
+            price = self.prices.get(asset)
+            fetched_at = self.fetched_at.get(asset)
+        if price is None:
+            logger.warning(f"No reference price for {asset}")
+            return None
+        if fetched_at is not None and time.monotonic() - fetched_at > self.max_stale:
+            logger.warning(f"Reference price for {asset} is older than {self.max_stale}s, skipping.")
+            return None
+        return price
+
+    def stats(self):
+        return {"fetches": self.fetches, "fetch_errors": self.fetch_errors, "assets": len(self.prices)}
+
+
+default_provider = ReferencePriceProvider()
+
+
+def get_reference_price(asset):
+    return default_provider.get_price(asset)
+
+
+def refresh_reference_prices(assets):
+    default_provider.refresh(assets)
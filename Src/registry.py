@@ -0,0 +1,95 @@
+import importlib
+import logging
+from importlib.metadata import entry_points
+
+logger = logging.getLogger("Registry")
+
+# Packages can add exchanges by declaring an entry point in this group whose
+# value is "module:ScraperClass".
+ENTRY_POINT_GROUP = "p2p_arbitrage.scrapers"
+
+# Scraper modules are imported only when their exchange is selected. The
+# flag marks scrapers that may drive a browser unless run with mode="api";
+# it is None for plugins, whose class is imported to find out.
+SCRAPERS = {
+    "binance": ("Scrappers.binance", "BinanceScraper", False),
+    "okx": ("Scrappers.okx", "OKXScraper", True),
+    "paxful": ("Scrappers.paxful", "PaxfulScraper", True),
+    "remintano": ("Scrappers.remitano", "RemitanoScraper", True),
+}
+
+ALIASES = {
+    "remitano": "remintano",
+}
+
+discovered = False
+
+
+def register(name, target, browser=None, aliases=()):
+    # target is "module:ScraperClass"; registering a name again replaces it.
+    module_name, _, class_name = target.partition(":")
+    if not class_name:
+        raise ValueError(f"Expected 'module:Class' for scraper '{name}', got {target!r}")
+    name = name.lower()
+    SCRAPERS[name] = (module_name, class_name, browser)
+    for alias in aliases:
+        ALIASES[alias.lower()] = name
+
+
+def discover():
+    global discovered
+    if discovered:
+        return
+    discovered = True
+    for entry in entry_points(group=ENTRY_POINT_GROUP):
+        try:
+            register(entry.name, entry.value)
+        except ValueError as e:
+            logger.warning(f"Ignoring scraper plugin {entry.name}: {e}")
+
+
+def names():
+    discover()
+    return list(SCRAPERS)
+
+
+def resolve(name):
+    discover()
+    name = name.lower()
+    name = ALIASES.get(name, name)
+    if name not in SCRAPERS:
+        raise ValueError(f"Unknown exchange '{name}', expected one of: {', '.join(SCRAPERS)}")
+    return name
+
+
+def scraper_class(name):
+    module_name, class_name, _ = SCRAPERS[resolve(name)]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def scraper_classes(selected=None):
+    return [scraper_class(name) for name in (selected or names())]
+
+
+def browser_capable(name):
+    browser = SCRAPERS[resolve(name)][2]
+    if browser is None:
+        browser = getattr(scraper_class(name), "browser", False)
+    return browser
+
+
+def uses_browser(name, mode="auto"):
+    return browser_capable(name) and mode != "api"
+
+
+def capabilities(name, mode="auto"):
+    return scraper_class(name).capabilities(mode)
+
+
+def options(name, mode="auto"):
+    # Constructor arguments for running a scraper with the given backend.
+    return {"mode": mode} if browser_capable(name) else {}
+
+
+def create(name, mode="auto", **kwargs):
+    return scraper_class(name)(**{**options(name, mode), **kwargs})
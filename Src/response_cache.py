@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger("ResponseCache")
+
+
+class ResponseCache:
+    # Short-lived cache for exchange responses, keyed by
+    # (exchange, asset, fiat, side, page). Concurrent requests for a key that
+    # is already being fetched wait for that fetch instead of issuing their
+    # own; errors are passed to every waiter and never cached.
+    def __init__(self, ttl=5.0, max_bytes=32 * 1024 * 1024, max_entries=4096):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, fetch, ttl=None, size=None, cacheable=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[2] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.drop(key)
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            flight.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            if ttl > 0 and (cacheable is None or cacheable(value)):
+                self.put(key, value, size(value) if size else 0, ttl)
+        flight.set_result(value)
+        return value
+
+    def put(self, key, value, size, ttl):
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.drop(key)
+        # Least recently used entries go first once either cap is reached.
+        while self.entries and (self.bytes + size > self.max_bytes or len(self.entries) >= self.max_entries):
+            self.drop(next(iter(self.entries)))
+            self.evictions += 1
+        self.entries[key] = (value, size, time.monotonic() + ttl)
+        self.bytes += size
+
+    def drop(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
+
+
+shared = ResponseCache()
@@ -0,0 +1,237 @@
+import logging
+import math
+import numpy as np
+from Src.offers import CONVERSION_FEE
+from Src.offers import DEFAULT_ASSET
+from Src import metrics
+
+logger = logging.getLogger("Routes")
+
+# Taker fee on a P2P fill, as a fraction of the amount.
+TRADE_FEES = {
+    "binance": 0.0,
+    "okx": 0.0,
+    "remintano": 0.0,
+    "paxful": 0.0,
+}
+
+# Flat USDT cost of withdrawing from an exchange to another one, taken as
+# the same for every asset.
+WITHDRAWAL_FEES = {
+    "binance": 1.0,
+    "okx": 1.0,
+    "remintano": 1.0,
+    "paxful": 1.0,
+}
+DEFAULT_WITHDRAWAL_FEE = 1.0
+
+# Spread lost converting between fiats, and cost of moving a fiat balance
+# from one payment method to another.
+FX_FEE = 0.005
+METHOD_FEE = 0.002
+
+UNKNOWN_METHOD = "unknown"
+
+
+def fiat_node(fiat, method):
+    # Fiat balances sit off-exchange, so their exchange is None.
+    return None, fiat, method
+
+
+def asset_node(exchange, asset=DEFAULT_ASSET):
+    return exchange, asset, None
+
+
+def node_name(node):
+    exchange, currency, method = node
+    return f"{exchange}:{currency}" if exchange else f"{currency}/{method}"
+
+
+def fits(offer, notional_usd):
+    # The advert has to accept an order of the route's notional size.
+    amount = notional_usd * offer.price / offer.usd
+    if offer.min_amount and amount < offer.min_amount:
+        return False
+    if offer.max_amount and amount > offer.max_amount:
+        return False
+    return True
+
+
+class RouteGraph:
+    # Nodes are (exchange, currency, payment method); edges are P2P trades,
+    # crypto transfers between exchanges, spot conversions between assets on
+    # one exchange, fiat conversions and payment method switches, weighted by
+    # -log(rate net of fees). A profitable round trip is a negative cycle.
+    def __init__(self, notional_usd=1000.0, trade_fees=None, withdrawal_fees=None, fx_fee=FX_FEE, method_fee=METHOD_FEE,
+                 conversion_fee=CONVERSION_FEE):
+        self.notional_usd = notional_usd
+        self.trade_fees = dict(TRADE_FEES)
+        self.trade_fees.update(trade_fees or {})
+        self.withdrawal_fees = dict(WITHDRAWAL_FEES)
+        self.withdrawal_fees.update(withdrawal_fees or {})
+        self.fx_fee = fx_fee
+        self.method_fee = method_fee
+        self.conversion_fee = conversion_fee
+        self.nodes = {}
+        self.names = []
+        # (src, dst) -> (rate, kind, offer); parallel edges keep the best rate.
+        self.edges = {}
+        self.fx_rates = {}
+        self.methods = {}
+        self.spots = {}
+
+    @classmethod
+    def build(cls, offers, **kwargs):
+        graph = cls(**kwargs)
+        with metrics.span("route_graph"):
+            graph.add_offers(offers)
+            graph.link()
+        return graph
+
+    def node(self, key):
+        index = self.nodes.get(key)
+        if index is None:
+            index = self.nodes[key] = len(self.names)
+            self.names.append(key)
+        return index
+
+    def add_edge(self, src, dst, rate, kind, offer=None):
+        if rate <= 0:
+            return
+        key = (self.node(src), self.node(dst))
+        current = self.edges.get(key)
+        if current is None or rate > current[0]:
+            self.edges[key] = (rate, kind, offer)
+
+    def add_offers(self, offers):
+        for offer in offers:
+            if not offer.usd or offer.usd <= 0 or not fits(offer, self.notional_usd):
+                continue
+            self.fx_rates.setdefault(offer.fiat, offer.price / offer.usd)
+            self.spots.setdefault(offer.asset, offer.spot)
+            keep = 1.0 - self.trade_fees.get(offer.exchange, 0.0)
+            wallet = asset_node(offer.exchange, offer.asset)
+            for method in offer.payment_methods or (UNKNOWN_METHOD,):
+                self.methods.setdefault(offer.fiat, set()).add(method)
+                account = fiat_node(offer.fiat, method)
+                if offer.side == "BUY":
+                    self.add_edge(account, wallet, keep / offer.price, "buy", offer)
+                else:
+                    self.add_edge(wallet, account, keep * offer.price, "sell", offer)
+
+    def link(self):
+        holdings = {}
+        for exchange, asset, _ in self.nodes:
+            if exchange is not None:
+                holdings.setdefault(asset, set()).add(exchange)
+        for asset, exchanges in holdings.items():
+            for src in exchanges:
+                fee = self.withdrawal_fees.get(src, DEFAULT_WITHDRAWAL_FEE)
+                for dst in exchanges:
+                    if src != dst:
+                        self.add_edge(asset_node(src, asset), asset_node(dst, asset), 1.0 - fee / self.notional_usd, "transfer")
+        # Assets held on the same exchange convert at their reference prices.
+        for asset, exchanges in holdings.items():
+            for other, other_exchanges in holdings.items():
+                if other == asset:
+                    continue
+                rate = (1.0 - self.conversion_fee) * self.spots[asset] / self.spots[other]
+                for exchange in exchanges & other_exchanges:
+                    self.add_edge(asset_node(exchange, asset), asset_node(exchange, other), rate, "convert")
+        for fiat, methods in self.methods.items():
+            for method in methods:
+                for other in methods:
+                    if other != method:
+                        self.add_edge(fiat_node(fiat, method), fiat_node(fiat, other), 1.0 - self.method_fee, "switch")
+        # Conversions stay on the same payment method (e.g. a Wise balance).
+        for fiat, rate in self.fx_rates.items():
+            for other, other_rate in self.fx_rates.items():
+                if other == fiat:
+                    continue
+                for method in self.methods[fiat] & self.methods.get(other, set()):
+                    self.add_edge(fiat_node(fiat, method), fiat_node(other, method), (1.0 - self.fx_fee) * other_rate / rate, "fx")
+
+    def arrays(self, excluded=()):
+        keys = [key for key in self.edges if key not in excluded]
+        src = np.fromiter((key[0] for key in keys), dtype=np.int64, count=len(keys))
+        dst = np.fromiter((key[1] for key in keys), dtype=np.int64, count=len(keys))
+        weight = np.fromiter((-math.log(self.edges[key][0]) for key in keys), dtype=np.float64, count=len(keys))
+        return src, dst, weight
+
+    def relax(self, src, dst, weight, dist, pred, passes, tolerance=1e-12):
+        # Vectorised Bellman-Ford: every pass relaxes all edges at once and
+        # keeps the best incoming edge per node. Returns the last node that
+        # improved on the final pass, or None once distances settle.
+        for _ in range(passes):
+            candidate = dist[src] + weight
+            improved = np.flatnonzero(candidate < dist[dst] - tolerance)
+            if len(improved) == 0:
+                return None
+            order = improved[np.lexsort((candidate[improved], dst[improved]))]
+            first = np.r_[True, dst[order][1:] != dst[order][:-1]]
+            chosen = order[first]
+            dist[dst[chosen]] = candidate[chosen]
+            pred[dst[chosen]] = chosen
+        return int(dst[chosen[0]])
+
+    def negative_cycle(self, excluded=()):
+        src, dst, weight = self.arrays(excluded)
+        n = len(self.names)
+        if n == 0 or len(weight) == 0:
+            return None
+        # Starting every node at zero acts as a virtual source linked to all.
+        dist = np.zeros(n)
+        pred = np.full(n, -1, dtype=np.int64)
+        node = self.relax(src, dst, weight, dist, pred, n)
+        if node is None:
+            return None
+        # Walking back n predecessors lands on the cycle.
+        for _ in range(n):
+            if pred[node] < 0:
+                return None
+            node = int(src[pred[node]])
+        start, cycle, seen = node, [], set()
+        while node not in seen and pred[node] >= 0:
+            seen.add(node)
+            edge = pred[node]
+            cycle.append((int(src[edge]), node))
+            node = int(src[edge])
+        cycle.reverse()
+        if node != start or sum(weight[pred[b]] for _, b in cycle) >= 0:
+            return None
+        return cycle
+
+    def route(self, hops):
+        steps = []
+        rate = 1.0
+        for a, b in hops:
+            edge_rate, kind, offer = self.edges[(a, b)]
+            rate *= edge_rate
+            steps.append({"from": self.names[a], "to": self.names[b], "kind": kind, "rate": edge_rate, "offer": offer})
+        return {"steps": steps, "rate": rate, "profit_pct": (rate - 1.0) * 100.0}
+
+    def cycles(self, limit=5):
+        # After each hit the cycle's most profitable edge is taken out, so the
+        # next search has to find a route built on a different quote.
+        with metrics.span("route_search"):
+            routes, excluded = [], set()
+            for _ in range(limit):
+                cycle = self.negative_cycle(excluded)
+                if cycle is None:
+                    break
+                # Start each route from a fiat balance where there is one.
+                start = next((i for i, (a, _) in enumerate(cycle) if self.names[a][0] is None), 0)
+                cycle = cycle[start:] + cycle[:start]
+                routes.append(self.route(cycle))
+                excluded.add(max(cycle, key=lambda hop: self.edges[hop][0]))
+        routes.sort(key=lambda route: route["rate"], reverse=True)
+        return routes
+
+
+def describe(route):
+    parts = [node_name(route["steps"][0]["from"])]
+    for step in route["steps"]:
+        offer = step["offer"]
+        via = f" @{offer.price:g} {offer.merchant}" if offer is not None else ""
+        parts.append(f"-[{step['kind']}{via}]-> {node_name(step['to'])}")
+    return " ".join(parts)
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from Src.fiat_prices import get_exchange_rate
+from Src.reference_prices import get_reference_price, refresh_reference_prices
+from Src.scraper_base import asset_scrapers, job_budget
+from Src import metrics
+
+logger = logging.getLogger("ScanEngine")
+
+
+class ScanEngine:
+    def __init__(self, scrapers, max_workers=8, exchange_limits=None, job_timeout=300, default_exchange_limit=2, supervisor=None, feed_filter=None,
+                 assets=None):
+        # Every asset of an exchange runs through the same scraper resources
+        # and the same concurrency limit.
+        self.scrapers = asset_scrapers(scrapers, assets) if assets else scrapers
+        self.supervisor = supervisor
+        self.feed_filter = feed_filter
+        self.offers = []
+        self.max_workers = max_workers
+        self.job_timeout = job_timeout
+        exchange_limits = exchange_limits or {}
+        self.semaphores = {}
+        for scraper in self.scrapers:
+            if scraper.name in self.semaphores:
+                continue
+            capabilities = scraper.capabilities()
+            limit = exchange_limits.get(scraper.name, capabilities["max_concurrency"] or default_exchange_limit)
+            semaphore = asyncio.Semaphore if capabilities["async"] else threading.Semaphore
+            self.semaphores[scraper.name] = semaphore(max(1, limit))
+        self.loop = None
+        self.loop_lock = threading.Lock()
+
+    def build_jobs(self, fiat_currencies):
+        jobs = []
+        for scraper in self.scrapers:
+            fiats = []
+            for fiat in fiat_currencies:
+                if fiat not in scraper.supported_fiats:
+                    logger.info(f"Skipping {fiat} for {scraper.name} (unsupported fiat).")
+                    continue
+                if self.feed_filter is not None and not self.feed_filter(scraper.name, fiat):
+                    logger.info(f"Skipping {fiat} for {scraper.name} (backing off after empty scrapes).")
+                    continue
+                fiats.append(fiat)
+            if not fiats:
+                continue
+            # Scrapers with a batch entry point get one job covering all fiats.
+            if scraper.capabilities()["batch"]:
+                jobs.append((scraper, tuple(fiats)))
+            else:
+                jobs.extend((scraper, (fiat,)) for fiat in fiats)
+        return jobs
+
+    def run_job(self, scraper, fiats, started):
+        with self.semaphores[scraper.name]:
+            started[(scraper.name, fiats)] = time.monotonic()
+            logger.info(f"Fetching {scraper.name} prices for {', '.join(fiats)}.")
+            with metrics.span("job", exchange=scraper.name):
+                return scraper.get_offers_many(list(fiats))
+
+    async def run_async_job(self, scraper, fiats, started):
+        async with self.semaphores[scraper.name]:
+            started[(scraper.name, fiats)] = time.monotonic()
+            logger.info(f"Fetching {scraper.name} prices for {', '.join(fiats)}.")
+            with metrics.span("job", exchange=scraper.name):
+                return await scraper.fetch_offers(list(fiats))
+
+    def event_loop(self):
+        # One loop thread per engine, started on the first async job.
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="scan-async", daemon=True).start()
+            return self.loop
+
+    def submit(self, executor, scraper, fiats, started):
+        # Scrapers with a native async fetch_offers run as tasks on the
+        # engine's event loop instead of holding a thread each; cancelling
+        # their future cancels the task.
+        if scraper.capabilities()["async"]:
+            return asyncio.run_coroutine_threadsafe(self.run_async_job(scraper, fiats, started), self.event_loop())
+        return executor.submit(self.run_job, scraper, fiats, started)
+
+    def run(self, fiat_currencies, deadline=None, on_result=None, on_book=None):
+        buy_opportunities = []
+        sell_opportunities = []
+        self.offers = []
+        jobs = self.build_jobs(fiat_currencies)
+        if not jobs:
+            return buy_opportunities, sell_opportunities
+
+        cycle_start = time.monotonic()
+        # One reference price request per cycle covers every asset.
+        refresh_reference_prices({scraper.asset for scraper, _ in jobs})
+        if self.supervisor is not None:
+            results = self.supervisor.run_jobs(jobs, deadline)
+        else:
+            results = self.run_threaded(jobs, deadline)
+        for scraper, fiats, result in results:
+            if on_result is not None:
+                on_result(scraper, fiats, result)
+            for result_fiat, book in result.items():
+                with metrics.span("collect", exchange=scraper.name, fiat=result_fiat):
+                    self.collect(scraper, result_fiat, book, buy_opportunities, sell_opportunities, on_book)
+
+        metrics.observe("cycle", time.monotonic() - cycle_start)
+        logger.info(f"Scan cycle finished in {time.monotonic() - cycle_start:.2f}s ({len(jobs)} jobs).")
+        return buy_opportunities, sell_opportunities
+
+    def run_threaded(self, jobs, deadline=None):
+        # Same contract as Supervisor.run_jobs: jobs still outstanding at the
+        # cycle deadline are abandoned and the cycle scores what arrived.
+        cycle_end = time.monotonic() + deadline if deadline is not None else None
+        started = {}
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs)), thread_name_prefix="scan")
+        try:
+            pending = {}
+            for scraper, fiats in jobs:
+                future = self.submit(executor, scraper, fiats, started)
+                pending[future] = (scraper, fiats, time.monotonic())
+
+            while pending:
+                now = time.monotonic()
+                if cycle_end is not None and now >= cycle_end:
+                    logger.warning(f"Scan deadline reached with {len(pending)} jobs outstanding, scoring what arrived.")
+                    for future in pending:
+                        future.cancel()
+                    return
+                timeout = 1.0 if cycle_end is None else min(1.0, cycle_end - now)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    scraper, fiats, _ = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Job {scraper.name}/{','.join(fiats)} failed: {e}")
+                        continue
+                    yield scraper, fiats, result
+
+                now = time.monotonic()
+                for future, (scraper, fiats, submitted) in list(pending.items()):
+                    # A cancelled thread keeps running and keeps its exchange's
+                    # semaphore, so jobs queued behind it are timed from
+                    # submission.
+                    job_start = started.get((scraper.name, fiats), submitted)
+                    timeout = job_budget(self.job_timeout, fiats)
+                    if now - job_start > timeout:
+                        logger.warning(f"Job {scraper.name}/{','.join(fiats)} exceeded {timeout}s timeout, dropping its result.")
+                        future.cancel()
+                        del pending[future]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def collect(self, scraper, fiat, book, buy_opportunities, sell_opportunities, on_book=None):
+        best_buy, best_sell = book.best_ask, book.best_bid
+
+        if best_buy is None and best_sell is None:
+            logger.info(f"No offers found for {fiat} on {scraper.name}.")
+            return
+
+        rate = get_exchange_rate(fiat)
+        if rate is None:
+            logger.warning(f"Skipping conversion for {fiat} due to missing exchange rate.")
+            return
+        spot = get_reference_price(book.asset)
+        if spot is None:
+            logger.warning(f"Skipping {book.asset} offers on {scraper.name} due to missing reference price.")
+            return
+
+        self.offers.extend(book.convert(rate, spot))
+        # Books are handed on as each job lands, not once the cycle is over.
+        if on_book is not None:
+            on_book(book)
+
+        if best_buy is not None:
+            logger.info(f"{scraper.name} {book.asset}/{fiat} BUY: {best_buy.price} {fiat} (≈{best_buy.usd:.3f} USD), Merchant={best_buy.merchant}")
+            buy_opportunities.append(best_buy)
+        if best_sell is not None:
+            logger.info(f"{scraper.name} {book.asset}/{fiat} SELL: {best_sell.price} {fiat} (≈{best_sell.usd:.3f} USD), Merchant={best_sell.merchant}")
+            sell_opportunities.append(best_sell)
@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import time
+from Src.offers import best_prices
+
+logger = logging.getLogger("Scheduler")
+
+# Starting refresh interval until a feed's cost is known, and the base of
+# its backoff, by how the exchange is fetched.
+BASE_INTERVALS = {
+    "http": 30,
+    "browser": 240,
+}
+
+
+def job_spacing(capabilities):
+    # Minimum seconds between two job starts on the same exchange. A job may
+    # spend the scraper's whole request burst, so the next one starts once
+    # the bucket has refilled at the declared rate.
+    rate, burst = capabilities["rate_limit"], capabilities["rate_burst"]
+    if not rate:
+        return 0.0
+    return (burst or max(1.0, rate)) / rate
+
+
+class AdaptiveScheduler:
+    def __init__(self, scrapers, fiat_currencies, base_intervals=None, default_interval=120, min_spacing=None,
+                 budget=4.0, min_interval=15, max_interval=900, max_backoff=3600, threshold_pct=50.0,
+                 smoothing=0.3, value_floor=0.05, volatility_scale=0.01, mode="auto"):
+        self.scrapers = {scraper.name: scraper for scraper in scrapers}
+        # Intervals and spacing follow each scraper's declared capabilities,
+        # so plugin exchanges are paced like built-in ones; the arguments
+        # override them per exchange.
+        self.base_intervals = {}
+        self.min_spacing = {}
+        for scraper in scrapers:
+            capabilities = scraper.capabilities(getattr(scraper, "mode", mode))
+            self.base_intervals[scraper.name] = BASE_INTERVALS[capabilities["transport"]]
+            self.min_spacing[scraper.name] = job_spacing(capabilities)
+        self.base_intervals.update(base_intervals or {})
+        self.min_spacing.update(min_spacing or {})
+        self.default_interval = default_interval
+        # Worker-seconds per second the scheduler may spend on scraping.
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.threshold_pct = threshold_pct
+        self.smoothing = smoothing
+        self.value_floor = value_floor
+        self.volatility_scale = volatility_scale
+        self.last_start = {}
+        self.feeds = {}
+        for scraper in scrapers:
+            for fiat in fiat_currencies:
+                if fiat in scraper.supported_fiats:
+                    self.feeds[(scraper.name, fiat)] = self.new_feed()
+
+    def new_feed(self):
+        return {
+            "cost": None,
+            "volatility": 0.0,
+            "proximity": 0.0,
+            "last": {},
+            "misses": 0,
+            "next_due": 0.0,
+            "in_flight": False,
+            "refreshes": 0,
+        }
+
+    def base_interval(self, name):
+        return self.base_intervals.get(name, self.default_interval)
+
+    def value(self, feed):
+        # Feeds that move a lot, or sit close to a qualifying spread, earn a
+        # larger share of the scrape budget.
+        return self.value_floor + feed["volatility"] / self.volatility_scale + feed["proximity"]
+
+    def interval(self, key):
+        name = key[0]
+        feed = self.feeds[key]
+        if feed["misses"]:
+            return min(self.base_interval(name) * 2 ** min(feed["misses"], 16), self.max_backoff)
+        if feed["cost"] is None:
+            return self.base_interval(name)
+        live = [other for other in self.feeds.values() if not other["misses"]]
+        total_value = sum(self.value(other) for other in live) or 1.0
+        share = self.budget * self.value(feed) / total_value
+        return min(max(feed["cost"] / share, self.min_interval), self.max_interval)
+
+    def priority(self, key):
+        feed = self.feeds[key]
+        return self.value(feed) / (feed["cost"] or 1.0)
+
+    def is_live(self, name, fiat, now=None):
+        # One-shot scans skip only feeds still backing off after empty scrapes.
+        now = time.time() if now is None else now
+        feed = self.feeds.get((name, fiat))
+        return feed is None or not feed["misses"] or feed["next_due"] <= now
+
+    def due_jobs(self, now=None, capacity=None):
+        now = time.time() if now is None else now
+        due = [key for key, feed in self.feeds.items() if not feed["in_flight"] and feed["next_due"] <= now]
+        due.sort(key=self.priority, reverse=True)
+        grouped = {}
+        for name, fiat in due:
+            grouped.setdefault(name, []).append(fiat)
+
+        jobs = []
+        for name, fiats in sorted(grouped.items(), key=lambda item: -max(self.priority((item[0], fiat)) for fiat in item[1])):
+            if now < self.last_start.get(name, 0.0) + self.min_spacing.get(name, 0):
+                continue
+            scraper = self.scrapers[name]
+            # Batch scrapers take every due fiat in one job; the others get
+            # their most valuable due fiat, the rest wait out the spacing.
+            jobs.append((scraper, tuple(fiats) if scraper.capabilities()["batch"] else (fiats[0],)))
+            if capacity is not None and len(jobs) >= capacity:
+                break
+        return jobs
+
+    def started(self, scraper, fiats, now=None):
+        now = time.time() if now is None else now
+        self.last_start[scraper.name] = now
+        for fiat in fiats:
+            self.feeds[(scraper.name, fiat)]["in_flight"] = True
+
+    def finished(self, scraper, fiats, result=None, duration=None, board=None, now=None):
+        now = time.time() if now is None else now
+        result = result or {}
+        for fiat in fiats:
+            key = (scraper.name, fiat)
+            feed = self.feeds.setdefault(key, self.new_feed())
+            feed["in_flight"] = False
+            feed["refreshes"] += 1
+            book = result.get(fiat)
+            if not book:
+                feed["misses"] += 1
+            else:
+                feed["misses"] = 0
+                if duration is not None:
+                    cost = duration / len(fiats)
+                    feed["cost"] = cost if feed["cost"] is None else feed["cost"] + self.smoothing * (cost - feed["cost"])
+                self.update_volatility(feed, book)
+                if board is not None:
+                    feed["proximity"] = self.proximity(board, scraper.name, fiat)
+            feed["next_due"] = now + self.interval(key)
+
+    def update_volatility(self, feed, book):
+        best_buy, best_sell, _, _ = best_prices(book)
+        changes = []
+        for side, price in (("BUY", best_buy), ("SELL", best_sell)):
+            previous = feed["last"].get(side)
+            if price is not None and previous:
+                changes.append(abs(price - previous) / previous)
+            if price is not None:
+                feed["last"][side] = price
+        if changes:
+            change = max(changes)
+            feed["volatility"] += self.smoothing * (change - feed["volatility"])
+
+    def proximity(self, board, name, fiat):
+        best = 0.0
+        for buy_feed, sell_feed in board.pairs:
+            if (buy_feed[0], buy_feed[1]) == (name, fiat) or (sell_feed[0], sell_feed[1]) == (name, fiat):
+                best = max(best, board.pairs[(buy_feed, sell_feed)]["profit_pct"])
+        return min(best / self.threshold_pct, 1.0) if self.threshold_pct > 0 else 0.0
+
+    def next_wakeup(self, now=None):
+        now = time.time() if now is None else now
+        times = []
+        for (name, _), feed in self.feeds.items():
+            if feed["in_flight"]:
+                continue
+            times.append(max(feed["next_due"], self.last_start.get(name, 0.0) + self.min_spacing.get(name, 0)))
+        return max(min(times), now) if times else now + self.min_interval
+
+    def summary(self):
+        return {
+            f"{name}/{fiat}": {
+                "interval": round(self.interval((name, fiat)), 1),
+                "cost": round(feed["cost"], 2) if feed["cost"] is not None else None,
+                "volatility": round(feed["volatility"], 5),
+                "proximity": round(feed["proximity"], 3),
+                "misses": feed["misses"],
+            }
+            for (name, fiat), feed in sorted(self.feeds.items())
+        }
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        state = {
+            f"{name}|{fiat}": {field: value for field, value in feed.items() if field != "in_flight"}
+            for (name, fiat), feed in self.feeds.items()
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scheduler state {path}: {e}")
+            return
+        for key, saved in state.items():
+            name, _, fiat = key.partition("|")
+            if (name, fiat) in self.feeds:
+                self.feeds[(name, fiat)].update(saved)
@@ -0,0 +1,146 @@
+import asyncio
+import copy
+import logging
+import threading
+import time
+from Src.offers import SIDES, DEFAULT_ASSET, OfferBook, best_prices
+from Src import metrics
+
+logger = logging.getLogger("Scraper")
+
+
+class RateLimiter:
+    # Token bucket shared by every request a scraper makes; acquire() blocks
+    # the calling thread until a request may go out.
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1.0
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+
+
+def rate_limiter(rate, burst=None):
+    return RateLimiter(rate, burst) if rate else None
+
+
+def job_budget(job_timeout, fiats):
+    # Batch jobs get the per-job budget once per fiat they cover.
+    return job_timeout * len(fiats)
+
+
+def select_sides(books, sides):
+    if tuple(sides) == SIDES:
+        return books
+    return {
+        fiat: OfferBook(book.exchange, fiat, book["BUY"] if "BUY" in sides else (), book["SELL"] if "SELL" in sides else (),
+                        book.timestamp, book.asset)
+        for fiat, book in books.items()
+    }
+
+
+class AssetView:
+    # A scraper class pinned to one asset, for jobs run by worker processes
+    # that build the scraper themselves.
+    def __init__(self, scraper_class, asset):
+        self.scraper_class = scraper_class
+        self.asset = asset
+
+    def __getattr__(self, name):
+        return getattr(self.scraper_class, name)
+
+    def __repr__(self):
+        return f"AssetView({self.scraper_class.__name__}, {self.asset})"
+
+
+def asset_scrapers(scrapers, assets):
+    # One scraper per exchange and listed asset. Instances are copied with
+    # for_asset; classes stay classes for the default asset.
+    selected = []
+    for scraper in scrapers:
+        for asset in assets:
+            if asset not in scraper.supported_assets:
+                logger.info(f"Skipping {asset} for {scraper.name} (unsupported asset).")
+            elif not isinstance(scraper, type):
+                selected.append(scraper.for_asset(asset))
+            elif asset == scraper.asset:
+                selected.append(scraper)
+            else:
+                selected.append(AssetView(scraper, asset))
+    return selected
+
+
+class Scraper:
+    # Interface every exchange plugin implements. Subclasses declare their
+    # capabilities as class attributes and provide either the blocking
+    # get_offers_many(fiats, sides) or a native async fetch_offers; each is
+    # derived from the other, so a subclass without either is rejected. Both
+    # return {fiat: OfferBook} batches.
+    name = None
+    supported_fiats = ()
+    supported_assets = (DEFAULT_ASSET,)
+    asset = DEFAULT_ASSET
+    supports_batch = False
+    max_concurrency = 1
+    # Sustained requests per second across all of the scraper's HTTP calls
+    # (None for no limit), and how many may go out at once before it applies.
+    rate_limit = None
+    rate_burst = None
+    # True for scrapers that may drive a browser unless run with mode="api".
+    browser = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.fetch_offers is Scraper.fetch_offers and cls.get_offers_many is Scraper.get_offers_many:
+            raise TypeError(f"{cls.__name__} must implement get_offers_many or fetch_offers")
+
+    @classmethod
+    def capabilities(cls, mode="auto"):
+        return {
+            "fiats": tuple(cls.supported_fiats),
+            "assets": tuple(cls.supported_assets),
+            "batch": cls.supports_batch,
+            "max_concurrency": cls.max_concurrency,
+            "rate_limit": cls.rate_limit,
+            "rate_burst": cls.rate_burst,
+            "transport": "browser" if cls.browser and mode != "api" else "http",
+            "async": cls.fetch_offers is not Scraper.fetch_offers,
+        }
+
+    def for_asset(self, asset):
+        # Same scraper on another asset. The copy shares the HTTP session,
+        # rate limiter, parse cache and browser pool, so scanning more assets
+        # adds requests but no new connections or browsers.
+        if asset not in self.supported_assets:
+            raise ValueError(f"{self.name} does not list {asset}")
+        if asset == self.asset:
+            return self
+        scraper = copy.copy(self)
+        scraper.asset = asset
+        return scraper
+
+    async def fetch_offers(self, fiats, sides=SIDES):
+        return await asyncio.to_thread(self.get_offers_many, list(fiats), tuple(sides))
+
+    def get_offers_many(self, fiats, sides=SIDES):
+        return asyncio.run(self.fetch_offers(fiats, sides))
+
+    def get_best_prices_many(self, fiats):
+        offers = self.get_offers_many(fiats)
+        return {fiat: best_prices(offers[fiat]) for fiat in fiats}
+
+    def get_best_prices(self, fiat):
+        with metrics.span("get_best_prices", exchange=self.name, fiat=fiat):
+            return self.get_best_prices_many([fiat])[fiat]
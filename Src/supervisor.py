@@ -0,0 +1,252 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from collections import deque
+from Src import metrics
+from Src.scraper_base import job_budget
+
+logger = logging.getLogger("Supervisor")
+
+
+def worker_main(worker_id, scraper_class, scraper_kwargs, tasks, results):
+    # Own process group, so killing the worker also takes down any
+    # chromedriver/Chrome processes it started.
+    if hasattr(os, "setsid"):
+        os.setsid()
+    from Src.browser_pool import close_all_pools
+
+    try:
+        scraper = scraper_class(**scraper_kwargs)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job_id, fiats, asset = task
+            try:
+                with metrics.span("job", exchange=scraper.name):
+                    result = scraper.for_asset(asset).get_offers_many(list(fiats))
+                results.put(("done", worker_id, job_id, result, metrics.registry.drain()))
+            except Exception as e:
+                results.put(("error", worker_id, job_id, f"{type(e).__name__}: {e}", metrics.registry.drain()))
+    finally:
+        # multiprocessing skips atexit hooks in children, so close browsers here.
+        close_all_pools()
+
+
+class Supervisor:
+    def __init__(self, scraper_classes, scraper_kwargs=None, job_timeout=300, max_processes_per_exchange=2,
+                 start_method="spawn", poll_interval=0.5, shutdown_timeout=5, max_crashes=5):
+        self.scrapers = list(scraper_classes)
+        self.scraper_kwargs = scraper_kwargs or {}
+        self.job_timeout = job_timeout
+        self.max_processes_per_exchange = max_processes_per_exchange
+        self.poll_interval = poll_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.max_crashes = max_crashes
+        self.context = multiprocessing.get_context(start_method)
+        self.results = None
+        self.workers = {}
+        self.crashes = {}
+        self.job_ids = itertools.count()
+        self.worker_ids = itertools.count()
+        self.respawns = 0
+        self.kills = 0
+        # Jobs handed in one at a time through submit(), for the daemon.
+        self.queued = {}
+        self.backlog = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def processes_for(self, scraper):
+        return max(1, min(scraper.capabilities()["max_concurrency"], self.max_processes_per_exchange))
+
+    def start(self):
+        self.results = self.context.Queue()
+        self.revive()
+        logger.info(f"Started {len(self.workers)} scraper worker processes.")
+
+    def spawn(self, scraper, slot):
+        # Fresh id per process, so messages from a killed worker are ignored.
+        worker_id = f"{scraper.name}-{slot}-{next(self.worker_ids)}"
+        tasks = self.context.Queue()
+        process = self.context.Process(
+            target=worker_main,
+            args=(worker_id, scraper, self.scraper_kwargs.get(scraper.name, {}), tasks, self.results),
+            name=f"scraper-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self.workers[worker_id] = {"scraper": scraper, "slot": slot, "process": process, "tasks": tasks, "job": None, "started": None}
+
+    def kill(self, worker_id):
+        process = self.workers[worker_id]["process"]
+        if process.is_alive():
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except (ProcessLookupError, PermissionError):
+                process.kill()
+        process.join(self.shutdown_timeout)
+        self.kills += 1
+
+    def respawn(self, worker_id):
+        worker = self.workers.pop(worker_id)
+        self.spawn(worker["scraper"], worker["slot"])
+        self.respawns += 1
+
+    def revive(self):
+        # Fill every slot, including ones given up on after repeated crashes.
+        for scraper in self.scrapers:
+            live = {worker["slot"] for worker in self.workers.values() if worker["scraper"] is scraper}
+            missing = [slot for slot in range(self.processes_for(scraper)) if slot not in live]
+            if missing:
+                self.crashes[scraper.name] = 0
+            for slot in missing:
+                self.spawn(scraper, slot)
+
+    def dispatch(self, backlog, pending):
+        # Jobs go to a specific idle worker, so the supervisor always knows
+        # which job a dead or stuck process was holding.
+        for worker in self.workers.values():
+            jobs = backlog.get(worker["scraper"].name)
+            if worker["job"] is None and jobs:
+                job_id = jobs.popleft()
+                worker["job"], worker["started"] = job_id, time.monotonic()
+                scraper, fiats = pending[job_id]
+                worker["tasks"].put((job_id, fiats, scraper.asset))
+
+    def run_jobs(self, jobs, deadline=None):
+        # Yields (scraper, fiats, result) as workers report back. A job that
+        # overruns its budget has its worker killed and respawned; anything
+        # still outstanding at the cycle deadline is abandoned.
+        cycle_end = time.monotonic() + deadline if deadline is not None else None
+        self.revive()
+        pending = {}
+        backlog = {}
+        for scraper, fiats in jobs:
+            job_id = next(self.job_ids)
+            pending[job_id] = (scraper, fiats)
+            backlog.setdefault(scraper.name, deque()).append(job_id)
+
+        while pending:
+            self.dispatch(backlog, pending)
+            now = time.monotonic()
+            if cycle_end is not None and now >= cycle_end:
+                logger.warning(f"Scan deadline reached with {len(pending)} jobs outstanding, scoring what arrived.")
+                self.abandon(pending)
+                return
+            timeout = self.poll_interval if cycle_end is None else min(self.poll_interval, cycle_end - now)
+            try:
+                kind, worker_id, job_id, payload, timings = self.results.get(timeout=timeout)
+            except queue.Empty:
+                kind = None
+            else:
+                # Stage timings recorded in the worker join the parent's registry.
+                metrics.registry.merge(timings)
+            if kind is not None and worker_id in self.workers:
+                worker = self.workers[worker_id]
+                worker["job"], worker["started"] = None, None
+                self.crashes[worker["scraper"].name] = 0
+                job = pending.pop(job_id, None)
+                if job is not None:
+                    scraper, fiats = job
+                    if kind == "done":
+                        yield scraper, fiats, payload
+                    else:
+                        logger.error(f"Job {scraper.name}/{','.join(fiats)} failed: {payload}")
+            self.check_workers(pending, backlog)
+
+    def submit(self, scraper, fiats):
+        # Queues one job for poll(); returns its id. An exchange given up on
+        # after repeated crashes gets its workers back on its next job.
+        if not any(worker["scraper"].name == scraper.name for worker in self.workers.values()):
+            self.revive()
+        job_id = next(self.job_ids)
+        self.queued[job_id] = (scraper, fiats)
+        self.backlog.setdefault(scraper.name, deque()).append(job_id)
+        return job_id
+
+    def poll(self, timeout=None):
+        # Incremental run_jobs for callers that keep submitting: returns
+        # (job_id, result, error) for every submitted job that came back,
+        # failed, or was lost with a dead or overdue worker.
+        self.dispatch(self.backlog, self.queued)
+        outcomes = []
+        try:
+            kind, worker_id, job_id, payload, timings = self.results.get(timeout=self.poll_interval if timeout is None else timeout)
+        except queue.Empty:
+            kind = None
+        else:
+            metrics.registry.merge(timings)
+        if kind is not None and worker_id in self.workers:
+            worker = self.workers[worker_id]
+            worker["job"], worker["started"] = None, None
+            self.crashes[worker["scraper"].name] = 0
+            if self.queued.pop(job_id, None) is not None:
+                outcomes.append((job_id, payload, None) if kind == "done" else (job_id, None, RuntimeError(payload)))
+        before = set(self.queued)
+        self.check_workers(self.queued, self.backlog)
+        for job_id in before - set(self.queued):
+            outcomes.append((job_id, None, RuntimeError("worker died or exceeded the job timeout")))
+        self.dispatch(self.backlog, self.queued)
+        return outcomes
+
+    def check_workers(self, pending, backlog):
+        now = time.monotonic()
+        for worker_id, worker in list(self.workers.items()):
+            job = pending.get(worker["job"]) if worker["job"] is not None else None
+            if not worker["process"].is_alive():
+                logger.error(f"Worker {worker_id} exited with code {worker['process'].exitcode}.")
+                if job is not None:
+                    del pending[worker["job"]]
+                    logger.error(f"Job {job[0].name}/{','.join(job[1])} lost with its worker.")
+                name = worker["scraper"].name
+                self.crashes[name] = self.crashes.get(name, 0) + 1
+                if self.crashes[name] < self.max_crashes:
+                    self.respawn(worker_id)
+                    continue
+                # A scraper that keeps dying is given up on until the next cycle.
+                del self.workers[worker_id]
+                if not any(other["scraper"].name == name for other in self.workers.values()):
+                    logger.error(f"{name} workers crashed {self.crashes[name]} times in a row, dropping its jobs.")
+                    for job_id in backlog.pop(name, ()):
+                        del pending[job_id]
+                continue
+            if job is None:
+                continue
+            scraper, fiats = job
+            timeout = job_budget(self.job_timeout, fiats)
+            if now - worker["started"] > timeout:
+                logger.warning(f"Job {scraper.name}/{','.join(fiats)} exceeded {timeout}s, killing worker {worker_id}.")
+                del pending[worker["job"]]
+                self.kill(worker_id)
+                self.respawn(worker_id)
+
+    def abandon(self, pending):
+        for worker_id, worker in list(self.workers.items()):
+            if worker["job"] in pending:
+                self.kill(worker_id)
+                self.respawn(worker_id)
+        pending.clear()
+
+    def close(self):
+        for worker in self.workers.values():
+            worker["tasks"].put(None)
+        end = time.monotonic() + self.shutdown_timeout
+        for worker_id, worker in self.workers.items():
+            worker["process"].join(max(0.0, end - time.monotonic()))
+            if worker["process"].is_alive():
+                self.kill(worker_id)
+        logger.info(f"Stopped scraper workers ({self.kills} killed, {self.respawns} respawned).")
+        self.workers = {}
@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException, StaleElementReferenceException
+from Src import metrics
+
+logger = logging.getLogger("Waits")
+
+SITE_TIMEOUTS = {
+    "default": {"page": 20, "element": 10, "rows": 15, "stale": 5, "popup": 5, "quiet": 5, "settle": 0.5, "quiet_ms": 300},
+    "okx": {"element": 20},
+    "remintano": {"element": 20},
+    "paxful": {"rows": 20},
+}
+
+DOM_QUIET_SCRIPT = """
+if (!window.__waitObserver) {
+    window.__lastMutation = Date.now();
+    window.__waitObserver = new MutationObserver(function () { window.__lastMutation = Date.now(); });
+    window.__waitObserver.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+}
+return Date.now() - window.__lastMutation;
+"""
+
+NETWORK_STATE_SCRIPT = "return [document.readyState, performance.getEntriesByType('resource').length];"
+
+
+class rows_stable:
+    def __init__(self, locator, settle=0.5, min_rows=1):
+        self.locator = locator
+        self.settle = settle
+        self.min_rows = min_rows
+        self.last_count = None
+        self.since = None
+
+    def __call__(self, driver):
+        elements = driver.find_elements(*self.locator)
+        now = time.monotonic()
+        if len(elements) != self.last_count:
+            self.last_count = len(elements)
+            self.since = now
+            return False
+        if len(elements) >= self.min_rows and now - self.since >= self.settle:
+            return elements
+        return False
+
+
+class rows_replaced:
+    def __init__(self, marker):
+        self.element, self.text = marker
+
+    def __call__(self, driver):
+        try:
+            return self.element.text != self.text
+        except StaleElementReferenceException:
+            return True
+
+
+class network_idle:
+    def __init__(self, idle_time=0.5):
+        self.idle_time = idle_time
+        self.last_count = None
+        self.since = None
+
+    def __call__(self, driver):
+        ready_state, count = driver.execute_script(NETWORK_STATE_SCRIPT)
+        now = time.monotonic()
+        if ready_state != "complete" or count != self.last_count:
+            self.last_count = count
+            self.since = now
+            return False
+        return now - self.since >= self.idle_time
+
+
+class dom_quiet:
+    def __init__(self, quiet_ms=300):
+        self.quiet_ms = quiet_ms
+
+    def __call__(self, driver):
+        try:
+            return driver.execute_script(DOM_QUIET_SCRIPT) >= self.quiet_ms
+        except WebDriverException:
+            return False
+
+
+class WaitTelemetry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waits = {}
+
+    def record(self, site, name, duration, timed_out):
+        with self.lock:
+            entry = self.waits.setdefault((site, name), {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0})
+            entry["count"] += 1
+            entry["total"] += duration
+            entry["max"] = max(entry["max"], duration)
+            if timed_out:
+                entry["timeouts"] += 1
+
+    def summary(self):
+        with self.lock:
+            return {
+                f"{site}.{name}": {
+                    "count": entry["count"],
+                    "avg": round(entry["total"] / entry["count"], 3),
+                    "max": round(entry["max"], 3),
+                    "timeouts": entry["timeouts"],
+                }
+                for (site, name), entry in self.waits.items()
+            }
+
+
+telemetry = WaitTelemetry()
+
+
+class Waiter:
+    def __init__(self, driver, site, poll_frequency=0.1):
+        self.driver = driver
+        self.site = site
+        self.poll_frequency = poll_frequency
+        self.timeouts = dict(SITE_TIMEOUTS["default"])
+        self.timeouts.update(SITE_TIMEOUTS.get(site, {}))
+
+    def until(self, condition, name, timeout_key="element", required=True):
+        start = time.monotonic()
+        timed_out = False
+        try:
+            return WebDriverWait(self.driver, self.timeouts[timeout_key], poll_frequency=self.poll_frequency).until(condition)
+        except TimeoutException:
+            timed_out = True
+            if required:
+                raise
+            logger.debug(f"{self.site}: optional wait '{name}' timed out after {self.timeouts[timeout_key]}s")
+            return None
+        finally:
+            elapsed = time.monotonic() - start
+            telemetry.record(self.site, name, elapsed, timed_out)
+            metrics.observe("wait", elapsed, exchange=self.site, wait=name)
+
+    def clickable(self, xpath, name="clickable"):
+        return self.until(EC.element_to_be_clickable((By.XPATH, xpath)), name)
+
+    def visible(self, xpath, name="visible"):
+        return self.until(EC.visibility_of_element_located((By.XPATH, xpath)), name)
+
+    def present(self, xpath, name="present"):
+        return self.until(EC.presence_of_element_located((By.XPATH, xpath)), name)
+
+    def load(self, url, name="page_ready"):
+        with metrics.span("page_load", exchange=self.site):
+            self.driver.get(url)
+            return self.page_ready(name)
+
+    def page_ready(self, name="page_ready"):
+        return self.until(network_idle(self.timeouts["settle"]), name, "page", required=False)
+
+    def quiet(self, name="dom_quiet"):
+        return self.until(dom_quiet(self.timeouts["quiet_ms"]), name, "quiet", required=False)
+
+    def snapshot(self, xpath):
+        try:
+            elements = self.driver.find_elements(By.XPATH, xpath)
+            return (elements[0], elements[0].text) if elements else None
+        except StaleElementReferenceException:
+            return None
+
+    def rows(self, xpath, marker=None, name="rows", required=True):
+        # When a marker from before the triggering action is given, give the
+        # old rows a chance to be replaced before checking the count settles.
+        if marker is not None:
+            self.until(rows_replaced(marker), f"{name}_replaced", "stale", required=False)
+        return self.until(rows_stable((By.XPATH, xpath), self.timeouts["settle"]), name, "rows", required=required)
@@ -1,11 +1,22 @@
+import time
+
+STARTED = time.perf_counter()
+
 import logging
-from datetime import datetime
-from Src.fiat_prices import get_exchange_rate
-from Scrappers.binance import BinanceScraper
-from Scrappers.paxful import PaxfulScraper
-from Scrappers.remitano import RemitanoScraper
-from Scrappers.okx import OKXScraper
 import sys
+import argparse
+from contextlib import ExitStack
+from Src.scan_engine import ScanEngine
+from Src.fiat_prices import default_provider as fx_provider
+from Src.depth import DepthMatcher
+from Src.routes import RouteGraph, describe
+from Src.quote_store import QuoteStore
+from Src.reference_prices import SUPPORTED_ASSETS, default_provider as reference_provider
+from Src.supervisor import Supervisor
+from Src.scheduler import AdaptiveScheduler
+from Src import metrics
+from Src import registry
+from Src import response_cache
 
 
 if hasattr(sys.stdout, "reconfigure"):
@@ -20,109 +31,246 @@ logging.basicConfig(
     ]
 )
 
-def main():
+PROFIT_THRESHOLD_PCT = 50.0
+TOP_K_TRADES = 50
+JOB_TIMEOUT = 300
+SCAN_DEADLINE = 900
+SCHEDULER_STATE = "data/scheduler.json"
+ROUTE_LIMIT = 5
+ROUTE_NOTIONAL_USD = 1000.0
+
+FIAT_CURRENCIES = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
+ASSETS = ["USDT"]
+
+# Built-in exchanges plus any installed scraper plugins.
+EXCHANGES = registry.names()
+
+def scraper_kwargs(exchanges, backend="auto"):
+    return {name: registry.options(name, backend) for name in exchanges}
+
+def build_scrapers(exchanges=EXCHANGES, backend="auto"):
+    return [registry.create(name, backend) for name in exchanges]
+
+def exchange_name(value):
+    try:
+        return registry.resolve(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def broker_address(value):
+    from Src.cluster import parse_address
+
+    try:
+        return parse_address(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid broker address: {value}")
+
+def report_startup():
+    elapsed = time.perf_counter() - STARTED
+    metrics.observe("startup", elapsed)
+    browser = "loaded" if "selenium" in sys.modules else "not loaded"
+    logging.info(f"Startup took {elapsed:.3f}s (browser stack {browser}).")
+
+def alert_sink(value):
+    from Src import alerts
+
+    try:
+        return alerts.make_sink(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def run_daemon(exchanges=EXCHANGES, fiat_currencies=FIAT_CURRENCIES, threshold=PROFIT_THRESHOLD_PCT, backend="auto", metrics_file=None,
+               sinks=(), in_process=None):
+    from Src.daemon import Daemon, QuoteBoard
+
+    logging.info("Starting crypto P2P arbitrage daemon.")
+    if metrics_file:
+        metrics.registry.start_dump(metrics_file, interval=60)
+    # As in one-shot scans, browser exchanges run in worker processes, so a
+    # hung browser is killed at the job timeout instead of pinning its feed.
+    if in_process is None:
+        in_process = not any(registry.uses_browser(name, backend) for name in exchanges)
+    board = QuoteBoard(threshold_pct=threshold)
+    stream = None
+    if sinks:
+        from Src.alerts import AlertStream
+
+        stream = AlertStream(sinks, board=board)
+    with ExitStack() as stack:
+        supervisor = None
+        if in_process:
+            engine = ScanEngine(build_scrapers(exchanges, backend), max_workers=8, job_timeout=JOB_TIMEOUT)
+        else:
+            scraper_classes = [registry.scraper_class(name) for name in exchanges]
+            supervisor = stack.enter_context(Supervisor(scraper_classes, scraper_kwargs(exchanges, backend), job_timeout=JOB_TIMEOUT))
+            engine = ScanEngine(supervisor.scrapers, job_timeout=JOB_TIMEOUT, supervisor=supervisor)
+        report_startup()
+        daemon = Daemon(engine, board, fiat_currencies, store=QuoteStore(), state_path=SCHEDULER_STATE, alerts=stream,
+                        supervisor=supervisor, job_timeout=JOB_TIMEOUT)
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            daemon.stop()
+        finally:
+            if stream is not None:
+                stream.close()
+
+def scan(fiat_currencies, exchanges=EXCHANGES, threshold=PROFIT_THRESHOLD_PCT, backend="auto", in_process=None,
+         deadline=SCAN_DEADLINE, all_feeds=False, alerts=None, assets=ASSETS, broker=None, serve_broker=False):
+    # HTTP-only selections run on threads: no browser can hang, and worker
+    # processes would only add their own startup time.
+    if in_process is None:
+        in_process = not any(registry.uses_browser(name, backend) for name in exchanges)
+    scraper_classes = [registry.scraper_class(name) for name in exchanges]
+    # Feeds that keep coming back empty are skipped until their backoff expires.
+    scheduler = AdaptiveScheduler(scraper_classes, fiat_currencies, threshold_pct=threshold, mode=backend)
+    scheduler.load(SCHEDULER_STATE)
+    feed_filter = None if all_feeds else scheduler.is_live
+    on_book = alerts.on_book if alerts is not None else None
+
+    def finished(scraper, fiats, result):
+        # Feed schedules are kept for the first asset only.
+        if scraper.asset == assets[0]:
+            scheduler.finished(scraper, fiats, result)
+
+    if broker is not None:
+        # Shards of the job space go out through the broker to however many
+        # nodes are attached; each node builds its own scrapers.
+        from Src.cluster import Coordinator
+
+        with Coordinator(broker, job_timeout=JOB_TIMEOUT, serve=serve_broker) as coordinator:
+            engine = ScanEngine(scraper_classes, job_timeout=JOB_TIMEOUT, supervisor=coordinator, feed_filter=feed_filter,
+                                assets=assets)
+            report_startup()
+            engine.run(fiat_currencies, deadline=deadline, on_result=finished, on_book=on_book)
+    elif in_process:
+        engine = ScanEngine(build_scrapers(exchanges, backend), max_workers=8, job_timeout=JOB_TIMEOUT, feed_filter=feed_filter,
+                            assets=assets)
+        report_startup()
+        engine.run(fiat_currencies, deadline=deadline, on_result=finished, on_book=on_book)
+    else:
+        # Each exchange runs in its own worker process, so a hung browser only
+        # costs that exchange's results.
+        with Supervisor(scraper_classes, scraper_kwargs(exchanges, backend), job_timeout=JOB_TIMEOUT) as supervisor:
+            engine = ScanEngine(supervisor.scrapers, job_timeout=JOB_TIMEOUT, supervisor=supervisor, feed_filter=feed_filter,
+                                assets=assets)
+            report_startup()
+            engine.run(fiat_currencies, deadline=deadline, on_result=finished, on_book=on_book)
+    scheduler.save(SCHEDULER_STATE)
+    return engine
+
+def main(exchanges=EXCHANGES, fiat_currencies=FIAT_CURRENCIES, threshold=PROFIT_THRESHOLD_PCT, top_k=TOP_K_TRADES,
+         backend="auto", in_process=None, deadline=SCAN_DEADLINE, metrics_file=None, all_feeds=False, sinks=(), assets=ASSETS,
+         broker=None, serve_broker=False):
     logging.info("Starting crypto P2P price comparison for arbitrage opportunities.")
     
-    fiat_currencies = ["NGN", "USD", "EUR", "BRL", "KES", "GBP", "CAD", "AUD"]
-    
-    scrapers = [
-        BinanceScraper(),
-        OKXScraper(),
-        PaxfulScraper(),
-        RemitanoScraper(),
-        
-        
-    ]
-    
-    buy_opportunities = []  
-    sell_opportunities = [] 
-    
-    for scraper in scrapers:
-        for fiat in fiat_currencies:
-            if fiat not in scraper.supported_fiats:
-                logging.info(f"Skipping {fiat} for {scraper.name} (unsupported fiat).")
-                continue
-            
-            logging.info(f"Fetching {scraper.name} prices for {fiat}.")
-            best_buy, best_sell, best_buy_merchant, best_sell_merchant = scraper.get_best_prices(fiat)
-            
-            if best_buy is None and best_sell is None:
-                logging.info(f"No offers found for {fiat} on {scraper.name}.")
-                continue
-            
-            rate = get_exchange_rate(fiat)
-            if rate is None:
-                logging.warning(f"Skipping conversion for {fiat} due to missing exchange rate.")
-                continue
-            
-            usd_buy = best_buy / rate if best_buy is not None else None
-            usd_sell = best_sell / rate if best_sell is not None else None
-
-            if usd_buy is not None:
-                logging.info(f"{scraper.name} {fiat} BUY: {best_buy} {fiat} (≈{usd_buy:.3f} USD), Merchant={best_buy_merchant}")
-                buy_opportunities.append({
-                    "exchange": scraper.name,
-                    "fiat": fiat,
-                    "price": best_buy,
-                    "usd": usd_buy,
-                    "merchant": best_buy_merchant
-                })
-            if usd_sell is not None:
-                logging.info(f"{scraper.name} {fiat} SELL: {best_sell} {fiat} (≈{usd_sell:.3f} USD), Merchant={best_sell_merchant}")
-                sell_opportunities.append({
-                    "exchange": scraper.name,
-                    "fiat": fiat,
-                    "price": best_sell,
-                    "usd": usd_sell,
-                    "merchant": best_sell_merchant
-                })
-    
-    best_trade = None
-    best_profit_pct = 0.0
-    profitable_trades = []  
-    
-    for buy in buy_opportunities:
-        for sell in sell_opportunities:
-            if buy["exchange"] == sell["exchange"]:
-                continue
-            profit = sell["usd"] - buy["usd"]
-            if profit <= 0:
-                continue
-            profit_pct = (profit / buy["usd"]) * 100
-            
-            if profit_pct >= 50.0:
-                profitable_trades.append({
-                    "buy": buy,
-                    "sell": sell,
-                    "profit_pct": profit_pct,
-                    "profit_usd": profit
-                })
-                
-            if profit_pct > best_profit_pct:
-                best_profit_pct = profit_pct
-                best_trade = {
-                    "buy": buy,
-                    "sell": sell,
-                    "profit_pct": profit_pct,
-                    "profit_usd": profit
-                }
+    # With alert sinks configured, each opportunity goes out as soon as its
+    # two quotes are in, ahead of the full report below.
+    stream = None
+    if sinks:
+        from Src.alerts import AlertStream
+
+        stream = AlertStream(sinks, threshold_pct=threshold)
+    try:
+        engine = scan(fiat_currencies, exchanges, threshold, backend, in_process=in_process, deadline=deadline, all_feeds=all_feeds,
+                      alerts=stream, assets=assets, broker=broker, serve_broker=serve_broker)
+    finally:
+        if stream is not None:
+            stream.close()
+            logging.info(f"Alerts: {stream.stats()}")
+    for asset in assets:
+        QuoteStore(asset=asset).append([offer for offer in engine.offers if offer.asset == asset])
+    logging.info(f"FX rate cache stats: {fx_provider.stats()}")
+    logging.info(f"Reference prices: {reference_provider.stats()}")
+    logging.info(f"Response cache stats: {response_cache.shared.stats()}")
+    if "Src.waits" in sys.modules:
+        logging.info(f"Browser wait telemetry: {sys.modules['Src.waits'].telemetry.summary()}")
+    logging.info(f"Time per stage (s): {metrics.registry.summary()}")
+    logging.info(f"Time per exchange (s): {metrics.registry.summary(by='exchange', stage='job')}")
+    if metrics_file:
+        metrics.registry.dump(metrics_file)
     
-    profitable_trades.sort(key=lambda x: x["profit_pct"], reverse=True)
+    # Opportunities are ranked by the profit that can actually be filled
+    # across both books' depth, within each advert's order limits; pairs
+    # whose adverts list no limits follow with their size unknown.
+    matcher = DepthMatcher(threshold_pct=threshold, top_k=top_k)
+    profitable_trades, best_trade = matcher.match(engine.offers)
     
     print("\n\n========== Arbitrage Opportunities ==========")
     if best_trade:
-        print(f"Found {len(profitable_trades)} arbitrage opportunities with 50%+ profit:")
+        print(f"Found {len(profitable_trades)} arbitrage opportunities with {threshold:g}%+ profit:")
         
         for i, trade in enumerate(profitable_trades, 1):
             buy = trade["buy"]
             sell = trade["sell"]
             print(f"\n--- Opportunity #{i} (Profit: {trade['profit_pct']:.2f}%) ---")
-            print(f"[BUY] {buy['exchange']}: 1 USDT = {buy['price']} {buy['fiat']} (≈{buy['usd']:.3f} USD), Merchant={buy['merchant']}")
-            print(f"[SELL] {sell['exchange']}: 1 USDT = {sell['price']} {sell['fiat']} (≈{sell['usd']:.3f} USD), Merchant={sell['merchant']}")
+            print(f"[BUY] {buy.exchange}: 1 {buy.asset} = {buy.price} {buy.fiat} (≈{buy.usd:.3f} USD), Merchant={buy.merchant}")
+            print(f"[SELL] {sell.exchange}: 1 {sell.asset} = {sell.price} {sell.fiat} (≈{sell.usd:.3f} USD), Merchant={sell.merchant}")
             print(f"Net Profit: +{trade['profit_pct']:.2f}% per trade (≈{trade['profit_usd']:.3f} USD)")
+            if trade["orders"]:
+                print(f"Fillable: {trade['quantity']:.2f} USDT (≈{trade['volume_usd']:.2f} USD) over {trade['orders']} orders, "
+                      f"+{trade['weighted_profit_pct']:.2f}% volume-weighted (≈{trade['total_profit_usd']:.2f} USD)")
+            else:
+                print("Fillable: size unknown (order limits not listed)")
     else:
         print("No arbitrage opportunities found.")
     print("===========================================\n")
 
+    # Multi-hop round trips across exchanges, fiats and payment methods, net
+    # of fees, including same-exchange routes the direct pairs skip.
+    routes = RouteGraph.build(engine.offers, notional_usd=ROUTE_NOTIONAL_USD).cycles(ROUTE_LIMIT)
+    routes = [route for route in routes if route["profit_pct"] >= threshold]
+    print("========== Multi-hop Routes ==========")
+    if routes:
+        for i, route in enumerate(routes, 1):
+            print(f"\n--- Route #{i} (Profit: {route['profit_pct']:.2f}% on {ROUTE_NOTIONAL_USD:g} USD, {len(route['steps'])} hops) ---")
+            print(describe(route))
+    else:
+        print("No profitable routes found.")
+    print("===========================================\n")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Crypto P2P arbitrage scanner")
+    parser.add_argument("--exchanges", nargs="+", default=EXCHANGES, type=exchange_name, metavar="EXCHANGE",
+                        help=f"exchanges to scan (default: {' '.join(EXCHANGES)})")
+    parser.add_argument("--fiats", nargs="+", default=FIAT_CURRENCIES, type=str.upper, metavar="FIAT", help="fiat currencies to scan")
+    parser.add_argument("--assets", nargs="+", default=ASSETS, type=str.upper, choices=SUPPORTED_ASSETS, metavar="ASSET",
+                        help=f"crypto assets to scan and compare ({' '.join(SUPPORTED_ASSETS)}; default: {' '.join(ASSETS)})")
+    parser.add_argument("--threshold", type=float, default=PROFIT_THRESHOLD_PCT, help="minimum profit %% to report")
+    parser.add_argument("--top-k", type=int, default=TOP_K_TRADES, help="maximum opportunities to report")
+    parser.add_argument("--backend", choices=["auto", "api", "browser"], default="auto",
+                        help="how OKX, Remitano and Paxful are fetched; api never starts a browser")
+    parser.add_argument("--daemon", action="store_true", help="keep running and refresh each feed on its own schedule")
+    parser.add_argument("--in-process", action="store_true", default=None, help="run scrapers on threads instead of worker processes")
+    parser.add_argument("--deadline", type=float, default=SCAN_DEADLINE, help="seconds to wait for scrapers before scoring what arrived")
+    parser.add_argument("--all-feeds", action="store_true", help="also scrape feeds that are backing off after empty results")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port at /metrics")
+    parser.add_argument("--metrics-file", help="write per-stage timings as JSON to this file")
+    parser.add_argument("--alerts", nargs="+", default=[], type=alert_sink, metavar="SINK",
+                        help="stream opportunities as JSON lines to stdout, unix:PATH, tcp:HOST:PORT or an http(s) webhook URL")
+    parser.add_argument("--broker", type=broker_address, metavar="HOST:PORT",
+                        help="shard scrape jobs across nodes attached to this broker (python -m Src.cluster node)")
+    parser.add_argument("--serve-broker", action="store_true", help="also run the broker at --broker from this process")
+    args = parser.parse_args()
+    exchanges = list(dict.fromkeys(args.exchanges))
+    assets = list(dict.fromkeys(args.assets))
+    # The daemon converts quotes without reference prices, so it only
+    # follows USDT markets.
+    if args.daemon and assets != ["USDT"]:
+        parser.error("--daemon only scans USDT; drop --assets or run a one-shot scan")
+    if args.broker is not None:
+        from Src.cluster import broker_authkey
+
+        try:
+            broker_authkey()
+        except RuntimeError as e:
+            parser.error(str(e))
+    if args.metrics_port:
+        metrics.registry.serve(args.metrics_port)
+    if args.daemon:
+        run_daemon(exchanges, args.fiats, args.threshold, args.backend, metrics_file=args.metrics_file, sinks=args.alerts,
+                   in_process=args.in_process)
+    else:
+        main(exchanges, args.fiats, args.threshold, args.top_k, args.backend, in_process=args.in_process,
+             deadline=args.deadline, metrics_file=args.metrics_file, all_feeds=args.all_feeds, sinks=args.alerts,
+             assets=assets, broker=args.broker, serve_broker=args.serve_broker)
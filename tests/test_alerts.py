@@ -0,0 +1,37 @@
+import json
+import time
+from Src.alerts import AlertStream
+from Src.offers import Offer, OfferBook
+
+
+class ListSink:
+    name = "list"
+
+    def __init__(self):
+        self.events = []
+
+    def send(self, line):
+        self.events.append(json.loads(line))
+
+    def close(self):
+        pass
+
+
+def test_latency_is_measured_from_the_latest_fetch():
+    # The parse cache hands back the same Offer objects on every fetch of a
+    # quiet feed; only the books are new.
+    buy = Offer(1.0, "seller", "BUY", "USD", "okx")
+    sink = ListSink()
+    stream = AlertStream([sink], threshold_pct=50.0)
+    first = time.time() - 600
+    stream.on_book(OfferBook("okx", "USD", [buy], timestamp=first).convert(1.0))
+    stream.on_book(OfferBook("binance", "USD", [], [Offer(1.2, "buyer", "SELL", "USD", "binance")], timestamp=first).convert(1.0))
+    assert sink.events == []
+
+    arrived = time.time()
+    stream.on_book(OfferBook("okx", "USD", [buy], timestamp=arrived).convert(1.0))
+    stream.on_book(OfferBook("binance", "USD", [], [Offer(1.8, "buyer", "SELL", "USD", "binance")], timestamp=arrived).convert(1.0))
+    [event] = sink.events
+    assert event["time_to_alert"] < 5
+    assert event["buy"]["timestamp"] == event["sell"]["timestamp"] == arrived
+    assert buy.timestamp is None
@@ -0,0 +1,36 @@
+import numpy as np
+from Src.arbitrage import ArbitrageMatcher
+from Src.offers import Offer
+
+
+def offer(price, side, exchange, asset="USDT", spot=1.0):
+    return Offer(price, f"{exchange}-{side}-{price}", side, "USD", exchange, usd=price, asset=asset, spot=spot)
+
+
+def offers():
+    return [
+        offer(1.0, "BUY", "okx"),
+        offer(1.01, "BUY", "okx"),
+        offer(100.0, "BUY", "paxful", "BTC", 100.0),
+        offer(1.2, "SELL", "binance"),
+        offer(121.0, "SELL", "remintano", "BTC", 100.0),
+    ]
+
+
+def test_chunked_matrix_keeps_the_conversion_fee():
+    whole = ArbitrageMatcher(threshold_pct=0.0, conversion_fee=0.01).match(offers())[0]
+    chunked = ArbitrageMatcher(threshold_pct=0.0, conversion_fee=0.01, max_block_cells=1).match(offers())[0]
+    assert [t["profit_pct"] for t in chunked] == [t["profit_pct"] for t in whole]
+    assert np.isclose(whole[0]["profit_pct"], 21.0)
+
+
+def test_pruning_ranks_offers_within_their_asset():
+    # With k=1 the cheaper-looking USDT ask on okx must not push out the
+    # same-asset BTC ask, which avoids the fee against the BTC bid.
+    table = [
+        offer(1.0, "BUY", "okx"),
+        offer(101.0, "BUY", "okx", "BTC", 100.0),
+        offer(130.0, "SELL", "binance", "BTC", 100.0),
+    ]
+    trades, _ = ArbitrageMatcher(threshold_pct=0.0, top_k=1, conversion_fee=0.5).match(table)
+    assert trades[0]["buy"].asset == "BTC"
@@ -0,0 +1,53 @@
+from Src.daemon import QuoteBoard
+from Src.offers import Offer, OfferBook
+
+
+def books():
+    # The same Offer objects come back on every poll of a quiet feed.
+    eur = OfferBook("okx", "EUR", [Offer(0.918, "eur-seller", "BUY", "EUR", "okx")])
+    usd = OfferBook("binance", "USD", [], [Offer(1.02, "usd-buyer", "SELL", "USD", "binance")])
+    return eur, usd
+
+
+def update(board, eur, usd, eur_rate):
+    eur.convert(eur_rate)
+    usd.convert(1.0)
+    changed = []
+    for book in (eur, usd):
+        for side in ("BUY", "SELL"):
+            changed.extend(board.update(book.exchange, book.fiat, side, book[side], book.asset)[1])
+    return changed
+
+
+def test_fx_move_on_quiet_feed_rescores_pairs():
+    board = QuoteBoard(threshold_pct=5.0)
+    eur, usd = books()
+    update(board, eur, usd, 0.918 / 1.0)
+    assert round(board.best_trade()["profit_pct"], 2) == 2.0
+    assert board.opportunities() == []
+
+    # Only the EUR rate moves; both books are the very same objects.
+    changed = update(board, eur, usd, 0.918 / 0.9473)
+    assert changed
+    assert round(board.best_trade()["profit_pct"], 2) == 7.67
+    assert len(board.opportunities()) == 1
+
+
+def test_unchanged_feed_and_rate_skip_rescoring():
+    board = QuoteBoard()
+    eur, usd = books()
+    update(board, eur, usd, 0.918)
+    rescored = board.stats["rescored"]
+    assert update(board, eur, usd, 0.918) == []
+    assert board.stats["rescored"] == rescored
+
+
+def test_cross_asset_pairs_pay_the_conversion_fee():
+    board = QuoteBoard(threshold_pct=0.0, conversion_fee=0.01)
+    buy = Offer(100.0, "btc-seller", "BUY", "USD", "okx", usd=100.0, asset="BTC", spot=100.0)
+    sell = Offer(1.1, "usdt-buyer", "SELL", "USD", "binance", usd=1.1)
+    board.update("okx", "USD", "BUY", [buy], "BTC")
+    board.update("binance", "USD", "SELL", [sell], "USDT")
+    trade = board.best_trade()
+    assert trade["fee"] == 0.01
+    assert round(trade["profit_pct"], 6) == round((1.1 * 0.99 - 1.0) * 100, 6)
@@ -0,0 +1,20 @@
+from Src.depth import DepthMatcher
+from Src.offers import Offer
+
+
+def offer(price, merchant, side, exchange, available=100.0):
+    result = Offer(price, merchant, side, "USD", exchange, max_amount=1000.0, available=available)
+    result.usd = price
+    return result
+
+
+def test_deep_feed_pair_does_not_crowd_out_others():
+    # Twenty binance asks against twenty okx bids make 400 offer pairs near
+    # 100%; the single paxful bid at 90% is still its own feed pair.
+    offers = [offer(1.0 + i / 1000, f"b{i}", "BUY", "binance") for i in range(20)]
+    offers += [offer(2.0 - i / 1000, f"o{i}", "SELL", "okx") for i in range(20)]
+    offers.append(offer(1.9, "p0", "SELL", "paxful"))
+    trades, best = DepthMatcher(threshold_pct=50.0, top_k=5).match(offers)
+    pairs = {(trade["buy"].exchange, trade["sell"].exchange) for trade in trades}
+    assert pairs == {("binance", "okx"), ("binance", "paxful")}
+    assert best["sell"].exchange == "okx" and best["buy"].merchant == "b0"
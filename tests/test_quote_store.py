@@ -0,0 +1,14 @@
+import numpy as np
+from Src.offers import Offer
+from Src.quote_store import QuoteStore
+
+
+def test_late_writer_does_not_break_time_order(tmp_path):
+    store = QuoteStore(str(tmp_path))
+    offers = [Offer(1.0, "m", "BUY", "USD", "okx", usd=1.0)]
+    store.append(offers, ts=1_700_000_100.0)
+    # A writer whose time was taken before the other's append landed.
+    store.append(offers, ts=1_700_000_050.0)
+    rows = store.query(start=1_700_000_000.0, end=1_700_000_200.0)
+    assert len(rows) == 2
+    assert np.all(np.diff(rows["ts"]) >= 0)
@@ -0,0 +1,43 @@
+import threading
+import time
+from Src.offers import OfferBook
+from Src.scan_engine import ScanEngine
+from Src.scraper_base import Scraper
+
+
+class HangingScraper(Scraper):
+    name = "hanging"
+    supported_fiats = ("USD", "EUR", "GBP")
+    max_concurrency = 1
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get_offers_many(self, fiats, sides=("BUY", "SELL")):
+        if fiats == ["USD"]:
+            self.release.wait(30)
+        return {fiat: OfferBook(self.name, fiat) for fiat in fiats}
+
+
+def test_jobs_queued_behind_a_hung_job_time_out():
+    scraper = HangingScraper()
+    engine = ScanEngine([scraper], job_timeout=1)
+    start = time.monotonic()
+    try:
+        results = list(engine.run_threaded(engine.build_jobs(["USD", "EUR", "GBP"])))
+    finally:
+        scraper.release.set()
+    assert time.monotonic() - start < 5
+    assert results == []
+
+
+def test_threaded_scan_stops_at_the_deadline():
+    scraper = HangingScraper()
+    engine = ScanEngine([scraper], job_timeout=60)
+    start = time.monotonic()
+    try:
+        results = list(engine.run_threaded(engine.build_jobs(["EUR", "USD"]), deadline=1.0))
+    finally:
+        scraper.release.set()
+    assert time.monotonic() - start < 3
+    assert [fiats for _, fiats, _ in results] == [("EUR",)]